@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+from itertools import repeat
+from multiprocessing import Pool
+from operator import add
+
+from MySeq import MySeq, tabelaCodificacao
+
+NEG = -(1 << 60) #"menos infinito" inteiro, para não misturar floats nos scores
+
+# Alinhamento com gaps afins (Gotoh): um gap de comprimento L vale gapOpen + L * gapExtend.
+# H = melhor score a acabar em (i, j), E = a acabar num gap na seq1 (avança na seq2, horizontal),
+# F = a acabar num gap na seq2 (avança na seq1, vertical).
+# Cada linha é preenchida com operações em lista inteira (map) para F e para a diagonal, usando o perfil da linha
+# (scores da letra i da seq1 contra todas as letras da seq2); só E, que depende da célula à esquerda, precisa de um
+# ciclo por célula.
+
+#bits do traceback de cada célula
+DE_E, DE_F, ZERO = 1, 2, 3 #origem de H (0 = diagonal)
+E_EXT = 4 #E veio de E[i][j-1] (extensão) e não de H[i][j-1]
+F_EXT = 8 #F veio de F[i-1][j]
+
+
+class Alinhamento:
+
+    def __init__(self, score, aln1, aln2, inicio1, fim1, inicio2, fim2):
+        self.score = score
+        self.aln1 = aln1 #seqs alinhadas, com "-" nos gaps
+        self.aln2 = aln2
+        self.inicio1, self.fim1 = inicio1, fim1 #região [inicio, fim) de cada seq que está alinhada
+        self.inicio2, self.fim2 = inicio2, fim2
+
+    def __str__(self):
+        meio = "".join("|" if a == b and a != "-" else " " for a, b in zip(self.aln1, self.aln2))
+        return f"{self.aln1}\n{meio}\n{self.aln2}\nScore: {self.score}"
+
+    def identidade(self):
+        if not self.aln1: return 0.0
+        return sum(1 for a, b in zip(self.aln1, self.aln2) if a == b and a != "-") / len(self.aln1)
+
+
+class PairwiseAligner:
+
+    def __init__(self, mode="global", match=1, mismatch=-1, gapOpen=-2, gapExtend=-1, matriz=None, alfabeto="ACGT"):
+        """mode: global (Needleman-Wunsch), local (Smith-Waterman) ou semiglobal (gaps nas pontas grátis).
+        matriz: {} opcional (a, b) -> score; senão usa match/mismatch. gapOpen=0 dá gaps lineares."""
+        if mode not in ("global", "local", "semiglobal"):
+            raise ValueError("Modo desconhecido: " + mode)
+        self.mode = mode
+        self.gapOpen = gapOpen
+        self.gapExtend = gapExtend
+        self.alfabeto = alfabeto
+        self.mismatch = mismatch
+        n = len(alfabeto)
+        if matriz is not None:
+            self.sub = [[matriz[(a, b)] for b in alfabeto] for a in alfabeto]
+        else:
+            self.sub = [[match if i == j else mismatch for j in range(n)] for i in range(n)]
+        self.tabela = tabelaCodificacao(alfabeto)
+
+    def codifica(self, s): #MySeq ou str -> (str, códigos)
+        txt = s.seq if isinstance(s, MySeq) else str(s).upper()
+        return txt, txt.encode("ascii", "replace").translate(self.tabela)
+
+    def perfis(self, cods2):
+        """Para cada letra do alfabeto, a lista dos scores contra todas as posições da seq2 (mais uma para os
+        códigos inválidos, que dão sempre mismatch)"""
+        res = []
+        for a in range(len(self.alfabeto)):
+            linha = self.sub[a] + [self.mismatch] * (256 - len(self.alfabeto))
+            res.append([linha[b] for b in cods2])
+        res.append([self.mismatch] * len(cods2))
+        return res
+
+    def linhaInicial(self, m):
+        o, e = self.gapOpen, self.gapExtend
+        if self.mode == "global":
+            H = [0] + [o + j*e for j in range(1, m + 1)]
+        else:
+            H = [0] * (m + 1)
+        return H, [NEG] * (m + 1)
+
+    def preencheLinha(self, i, prevH, prevF, prof, comTraceback):
+        """Calcula a linha i (H, F e, se pedido, o traceback) a partir da linha i-1"""
+        o, e = self.gapOpen, self.gapExtend
+        oe = o + e
+        Fabre = list(map(add, prevH[1:], repeat(oe)))
+        Fext = list(map(add, prevF[1:], repeat(e)))
+        F = list(map(max, Fabre, Fext))
+        D = list(map(add, prevH[:-1], prof))
+        H0 = list(map(max, D, F))
+        local = self.mode == "local"
+        if self.mode == "global":
+            h = o + i*e
+        else:
+            h = 0
+        H = [h]
+        E = NEG
+        for j in range(len(H0)):
+            Eabre = h + oe
+            E = E + e
+            if Eabre >= E: E = Eabre
+            h = H0[j]
+            if E > h: h = E
+            if local and h < 0: h = 0
+            H.append(h)
+        Fcol0 = (o + i*e) if self.mode == "global" else NEG
+        F = [Fcol0] + F
+        if not comTraceback:
+            return H, F, None
+        tb = bytearray(len(H))
+        tb[0] = DE_F if self.mode == "global" else ZERO
+        Eant = NEG
+        for j in range(1, len(H)): #segunda passagem só para as origens, para o ciclo principal ficar curto
+            Eabre = H[j-1] + oe
+            Eext = Eant + e
+            Ej = Eext if Eext > Eabre else Eabre
+            bits = E_EXT if Eext > Eabre else 0
+            if Fext[j-1] > Fabre[j-1]: bits |= F_EXT
+            h = H[j]
+            if local and h == 0: bits |= ZERO
+            elif h == D[j-1]: pass
+            elif h == Ej: bits |= DE_E
+            else: bits |= DE_F
+            tb[j] = bits
+            Eant = Ej
+        return H, F, tb
+
+    # score em memória linear
+
+    def score(self, s1, s2):
+        """Só o score do alinhamento, guardando apenas a linha anterior (memória O(len(s2)))"""
+        _, c1 = self.codifica(s1)
+        _, c2 = self.codifica(s2)
+        return self.scoreCodigos(c1, c2)
+
+    def scoreCodigos(self, c1, c2, perfis=None):
+        perfis = perfis or self.perfis(c2)
+        H, F = self.linhaInicial(len(c2))
+        melhor = 0 if self.mode == "local" else NEG
+        ultimaColuna = H[-1] if self.mode == "semiglobal" else NEG
+        nalf = len(self.alfabeto)
+        for i in range(1, len(c1) + 1):
+            a = c1[i-1]
+            H, F, _ = self.preencheLinha(i, H, F, perfis[a if a < nalf else nalf], False)
+            if self.mode == "local":
+                melhor = max(melhor, max(H))
+            elif self.mode == "semiglobal":
+                ultimaColuna = max(ultimaColuna, H[-1])
+        if self.mode == "global":
+            return H[-1]
+        if self.mode == "semiglobal":
+            return max(ultimaColuna, max(H))
+        return melhor
+
+    # alinhamento com traceback
+
+    def align(self, s1, s2):
+        """Alinhamento completo: guarda uma matriz de traceback de 1 byte por célula (Gotoh)"""
+        t1, c1 = self.codifica(s1)
+        t2, c2 = self.codifica(s2)
+        n, m = len(c1), len(c2)
+        perfis = self.perfis(c2)
+        H, F = self.linhaInicial(m)
+        tb = [bytearray([DE_E if self.mode == "global" else ZERO]) * (m + 1)]
+        tb[0][0] = ZERO
+        melhor, bi, bj = (0, 0, 0) if self.mode == "local" else (NEG, 0, 0)
+        if self.mode == "semiglobal":
+            melhor, bi, bj = H[m], 0, m
+        nalf = len(self.alfabeto)
+        for i in range(1, n + 1):
+            a = c1[i-1]
+            H, F, linha = self.preencheLinha(i, H, F, perfis[a if a < nalf else nalf], True)
+            tb.append(linha)
+            if self.mode == "local":
+                mx = max(H)
+                if mx > melhor: melhor, bi, bj = mx, i, H.index(mx)
+            elif self.mode == "semiglobal":
+                if H[m] > melhor: melhor, bi, bj = H[m], i, m
+        if self.mode == "global":
+            melhor, bi, bj = H[m], n, m
+        elif self.mode == "semiglobal":
+            mx = max(H)
+            if mx > melhor: melhor, bi, bj = mx, n, H.index(mx)
+        return self.traceback(tb, t1, t2, melhor, bi, bj)
+
+    def traceback(self, tb, t1, t2, score, i, j):
+        a1, a2 = [], []
+        fim1, fim2 = i, j
+        estado = 0 #0 = H, 1 = E, 2 = F
+        while i > 0 or j > 0:
+            bits = tb[i][j]
+            if estado == 0:
+                origem = bits & 3
+                if origem == ZERO:
+                    if self.mode != "global" or (i == 0 and j == 0): break
+                if i == 0: origem = DE_E
+                elif j == 0: origem = DE_F
+                if origem == 0:
+                    a1.append(t1[i-1]); a2.append(t2[j-1])
+                    i -= 1; j -= 1
+                    continue
+                estado = 1 if origem == DE_E else 2
+            if estado == 1:
+                a1.append("-"); a2.append(t2[j-1])
+                if not (bits & E_EXT) or j == 1: estado = 0
+                j -= 1
+            else:
+                a1.append(t1[i-1]); a2.append("-")
+                if not (bits & F_EXT) or i == 1: estado = 0
+                i -= 1
+            if self.mode == "semiglobal" and (i == 0 or j == 0) and estado == 0:
+                break
+        ini1, ini2 = i, j
+        a1 = "".join(reversed(a1))
+        a2 = "".join(reversed(a2))
+        if self.mode == "semiglobal": #pontas livres: mostra o resto das seqs contra gaps
+            a1 = "-" * ini2 + t1[:ini1] + a1 + t1[fim1:] + "-" * (len(t2) - fim2)
+            a2 = t2[:ini2] + "-" * ini1 + a2 + "-" * (len(t1) - fim1) + t2[fim2:]
+        return Alinhamento(score, a1, a2, ini1, fim1, ini2, fim2)
+
+    # Hirschberg: alinhamento global com traceback em memória linear (só para gaps lineares)
+
+    def ultimaLinha(self, c1, c2):
+        e = self.gapExtend
+        H = [j*e for j in range(len(c2) + 1)]
+        nalf = len(self.alfabeto)
+        perfis = self.perfis(c2)
+        for i in range(1, len(c1) + 1):
+            a = c1[i-1]
+            D = list(map(add, H[:-1], perfis[a if a < nalf else nalf]))
+            V = list(map(add, H[1:], repeat(e)))
+            H0 = list(map(max, D, V))
+            h = i*e
+            novo = [h]
+            for x in H0:
+                h = h + e
+                if x > h: h = x
+                novo.append(h)
+            H = novo
+        return H
+
+    def alignHirschberg(self, s1, s2):
+        if self.mode != "global" or self.gapOpen != 0:
+            raise ValueError("O Hirschberg só está implementado para alinhamento global com gaps lineares (gapOpen=0)")
+        t1, c1 = self.codifica(s1)
+        t2, c2 = self.codifica(s2)
+        a1, a2 = self.hirschberg(t1, c1, t2, c2)
+        return Alinhamento(self.scoreCodigos(c1, c2), a1, a2, 0, len(t1), 0, len(t2))
+
+    def hirschberg(self, t1, c1, t2, c2):
+        if len(c1) == 0:
+            return "-" * len(c2), t2
+        if len(c2) == 0:
+            return t1, "-" * len(c1)
+        if len(c1) == 1 or len(c2) == 1:
+            aln = self.align(t1, t2)
+            return aln.aln1, aln.aln2
+        meio = len(c1) // 2
+        esq = self.ultimaLinha(c1[:meio], c2)
+        dir = self.ultimaLinha(c1[meio:][::-1], c2[::-1])
+        m = len(c2)
+        corte = max(range(m + 1), key=lambda j: (esq[j] + dir[m - j], -j))
+        a1, b1 = self.hirschberg(t1[:meio], c1[:meio], t2[:corte], c2[:corte])
+        a2, b2 = self.hirschberg(t1[meio:], c1[meio:], t2[corte:], c2[corte:])
+        return a1 + a2, b1 + b2
+
+
+# Uma query contra muitas seqs
+
+PARTILHADO = {}
+
+def iniciaBatch(aligner, query, traceback):
+    PARTILHADO["aligner"] = aligner
+    PARTILHADO["query"] = aligner.codifica(query)
+    PARTILHADO["traceback"] = traceback
+
+def alinhaTrabalho(alvo):
+    aligner = PARTILHADO["aligner"]
+    tq, cq = PARTILHADO["query"]
+    if PARTILHADO["traceback"]:
+        return aligner.align(tq, alvo)
+    _, ca = aligner.codifica(alvo)
+    return aligner.scoreCodigos(cq, ca)
+
+def alignBatch(aligner, query, alvos, traceback=False, processos=None):
+    """Alinha a query contra todas as seqs alvo num conjunto de processos; devolve os scores (ou os Alinhamentos, com
+    traceback=True) pela ordem dos alvos"""
+    alvos = [a.seq if isinstance(a, MySeq) else a for a in alvos]
+    query = query.seq if isinstance(query, MySeq) else query
+    with Pool(processos, iniciaBatch, (aligner, query, traceback)) as pool:
+        return pool.map(alinhaTrabalho, alvos, chunksize=max(1, len(alvos) // (4 * (processos or 4))))
+
+
+def test():
+    s1 = MySeq("GATTACAGATTACA")
+    s2 = MySeq("GATCACATTACA")
+    for mode in ("global", "local", "semiglobal"):
+        al = PairwiseAligner(mode, 2, -1, -3, -1)
+        aln = al.align(s1, s2)
+        print(mode, al.score(s1, s2))
+        print(aln)
+    lin = PairwiseAligner("global", 1, -1, 0, -2)
+    print(lin.alignHirschberg(s1, s2))
+    print(alignBatch(PairwiseAligner("local"), s1, ["TTACA", "GGGG", "GATTACA"], processos=2))
+
+if __name__ == "__main__":
+    test()
@@ -14,7 +14,7 @@ class BWT:
         for i in range(len(text)):
             ls.append(text[i:] + text[:i]) #cria as rotacoes
         ls.sort() #ordem aflabetica da coluna 1
-        res = " "
+        res = ""
         for j in range(len(text)):
             res += ls[j][len(text)-1]#adiciona ao res a ultima letra de cada linha, ou seja, a ultima coluna que é a bwt
         if buildsufarray:
@@ -119,7 +119,8 @@ def test3():
     print("Suffix array:", bw.sa)
     print(bw.bw_matching_pos("AGA"))
 
-test()
-#test2()
-#test3()
+if __name__ == "__main__":
+    test()
+    #test2()
+    #test3()
 
@@ -52,8 +52,6 @@ class BoyerMoore:
     def search_pattern(self, text):
         res = []
         i = 0 #posição i na sequencia
-        print(self.f)
-        print(self.s)
         while i <= (len(text) - len(self.pattern)):#para começar a correr a seq
             j = (len(self.pattern) - 1) #posicao no padrao vai ser = ao tamanho do padrão -1
             while j >= 0 and self.pattern[j] == text[j + i]: #continuar a correr enquanto esta a dar match
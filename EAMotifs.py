@@ -1,6 +1,6 @@
 from EvolAlgorithm import EvolAlgorithm
 from Popul import PopulInt, PopulReal
-from MotifFinding import MotifFinding
+from MotifFinding_comp_e_EX import MotifFinding
 from MyMotifs import MyMotifs
 
 
@@ -19,23 +19,19 @@ def printMat(mat):
 
 
 class EAMotifsInt (EvolAlgorithm):
-    def __init__(self, popsize, numits, noffspring, filename):
-        self.motifs = MotifFinding()
+    def __init__(self, popsize, numits, noffspring, filename, ambasCadeias=False, tamanhoCache=10000):
+        self.motifs = MotifFinding(ambasCadeias=ambasCadeias)
         self.motifs.readFile(filename, "dna")
         indsize = len(self.motifs)
-        EvolAlgorithm.__init__(self, popsize, numits, noffspring, indsize)
+        EvolAlgorithm.__init__(self, popsize, numits, noffspring, indsize, tamanhoCache)
 
     def initPopul(self, indsize):
-        maxvalue = self.motifs.seqSize(0) - self.motifs.motifSize
+        maxvalues = [self.motifs.ultimaPosicao(i) for i in range(indsize)] #cada seq tem o seu comprimento
         self.popul = PopulInt(self.popsize, indsize,
-                              maxvalue, [])
+                              maxvalues, [])
 
-    def evaluate(self, indivs):#mudar a funcao de avalicao -> usamos o score
-        for i in range(len(indivs)):
-            ind = indivs[i]#cada vetor de posicoes
-            sol = ind.getGenes()
-            fit = self.motifs.score(sol)#avaliar o score que sera a fit para cada vetor de posicoes iniciais
-            ind.setFitness(fit)
+    def fitnessGenomas(self, genomas):#mudar a funcao de avalicao -> usamos o score (so dos genomas que nao estao na cache)
+        return [self.motifs.score(sol) for sol in genomas]#score de cada vetor de posicoes iniciais
 
 
 class EAMotifsReal (EvolAlgorithm):
@@ -81,6 +77,7 @@ def test1():
     ea = EAMotifsInt(100, 1000, 50, "exemploMotifs.txt")
     ea.run()
     ea.printBestSolution()
+    print(ea.estatisticasCache())
 
 
 def test2():
@@ -89,5 +86,6 @@ def test2():
     ea.printBestSolution()
 
 
-test1()
-# test2()
+if __name__ == "__main__":
+    test1()
+    # test2()
@@ -1,25 +1,96 @@
+from collections import OrderedDict
+
 from Popul import Popul
 
 
+class CacheFitness:
+    """Cache LRU limitada das fitness já calculadas, com o genoma (tuplo dos genes) como chave. Quando fica cheia
+    esquece o genoma usado há mais tempo; tamanho=0 desliga a cache. Os hits e misses contam-se por individuo: um
+    genoma repetido na mesma geracao e um hit a partir da segunda vez."""
+
+    def __init__(self, tamanho=10000):
+        self.tamanho = tamanho
+        self.valores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.avaliacoes = 0 #genomas que foram mesmo avaliados (passados ao fitnessGenomas)
+
+    def __len__(self):
+        return len(self.valores)
+
+    def get(self, chave): #fitness guardada (e passa a ser a mais recente) ou None
+        fit = self.valores.get(chave)
+        if fit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.valores.move_to_end(chave)
+        return fit
+
+    def put(self, chave, fit):
+        if self.tamanho <= 0: return
+        self.valores[chave] = fit
+        self.valores.move_to_end(chave)
+        if len(self.valores) > self.tamanho:
+            self.valores.popitem(last=False)
+
+    def limpaEstatisticas(self):
+        self.hits = self.misses = self.avaliacoes = 0
+
+    def estatisticas(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "taxa": self.hits / total if total else 0.0,
+                "avaliacoes": self.avaliacoes, "tamanho": len(self.valores)}
+
+
 class EvolAlgorithm:
 
-    def __init__(self, popsize, numits, noffspring, indsize):
+    def __init__(self, popsize, numits, noffspring, indsize, tamanhoCache=10000):
         self.popsize = popsize#tamanho da pop
         self.numits = numits # numero de iteracoes
         self.noffspring = noffspring #numero de novos descendentes
         self.indsize = indsize#tamanho dos individuos
+        self.cache = CacheFitness(tamanhoCache) #fitness por genoma, partilhada pelas avaliacoes de todas as iteracoes
 
     def initPopul(self, indsize):#geracao de uma pop inicial
         self.popul = Popul(self.popsize, indsize)#tamanho da pop e dos ind
 
-    def evaluate(self, indivs):#avaliacao
-        for i in range(len(indivs)):#defenir a funcao de avaliacao para cada ind
-            ind = indivs[i]
+    def fitnessGenomas(self, genomas):#avaliador: recebe os genomas (tuplos) que nao estao na cache e devolve as fitness
+        res = []
+        for genes in genomas:#as subclasses redefinem este metodo com a sua funcao de avaliacao
             fit = 0.0
-            for x in ind.getGenes():#para cada ind vai buscar a sus representacao (vetor de 0 e 1)
-                if x == 1:#percorre o vetor inteiro
+            for x in genes:#percorre o vetor inteiro (vetor de 0 e 1)
+                if x == 1:
                     fit += 1.0#adiciona
-            ind.setFitness(fit)#quando acaba atribui essa fitness ao individuo
+            res.append(fit)
+        return res
+
+    def evaluate(self, indivs):#avaliacao: vai buscar a cache as fitness dos genomas ja vistos e so avalia os restantes
+        cache = self.cache
+        if cache.tamanho <= 0:#sem cache: avalia todos os individuos
+            for ind, fit in zip(indivs, self.fitnessGenomas([tuple(ind.getGenes()) for ind in indivs])):
+                ind.setFitness(fit)
+            cache.misses += len(indivs)
+            cache.avaliacoes += len(indivs)
+            return None
+        porAvaliar = {}#genoma -> individuos com esse genoma (os repetidos na mesma geracao so se avaliam uma vez)
+        for ind in indivs:
+            chave = tuple(ind.getGenes())
+            if chave in porAvaliar:#repetido nesta geracao: a fitness vem da avaliacao do primeiro, conta como hit
+                cache.hits += 1
+                porAvaliar[chave].append(ind)
+                continue
+            fit = cache.get(chave)
+            if fit is None:
+                porAvaliar[chave] = [ind]
+            else:
+                ind.setFitness(fit)
+        genomas = list(porAvaliar)
+        cache.avaliacoes += len(genomas)
+        for chave, fit in zip(genomas, self.fitnessGenomas(genomas)):
+            self.cache.put(chave, fit)
+            for ind in porAvaliar[chave]:
+                ind.setFitness(fit)#quando acaba atribui essa fitness ao individuo
         return None
 
     def iteration(self):#iteracao (estrutura do algoritmo evolucionario)
@@ -30,6 +101,7 @@ class EvolAlgorithm:
         #continuar ate atingir o criterio de paragem
 
     def run(self):
+        self.cache.limpaEstatisticas()#hits/misses so desta corrida (ver estatisticasCache)
         self.initPopul(self.indsize)#criar a pop inicial
         self.evaluate(self.popul.indivs)#avaliar essa pop
         self.bestsol = self.popul.bestSolution()#solucao inicial
@@ -40,6 +112,9 @@ class EvolAlgorithm:
                 self.bestsol = bs
             print("Iteration:", i, " ", "Best: ", self.bestsol)
 
+    def estatisticasCache(self):#hits, misses, taxa de hits, nº de avaliacoes e nº de genomas guardados na ultima corrida
+        return self.cache.estatisticas()
+
     def printBestSolution(self):
         print("Best solution: ", self.bestsol.getGenes())
         print("Best fitness:", self.bestsol.getFitness())
@@ -48,6 +123,21 @@ class EvolAlgorithm:
 def test():
     ea = EvolAlgorithm(100, 20, 50, 10)
     ea.run()
+    print(ea.estatisticasCache())
+
+def testCache(): #com a cache ligada a mesma corrida (mesma semente) faz menos avaliacoes e chega ao mesmo resultado
+    import contextlib, io, random
+    res = []
+    for tamanho in (0, 10000):
+        random.seed(7)
+        ea = EvolAlgorithm(100, 20, 50, 10, tamanhoCache=tamanho)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ea.run()
+        est = ea.estatisticasCache()
+        assert est["hits"] + est["misses"] == 100 + 21 * 50 #um hit ou um miss por individuo avaliado
+        res.append((est["avaliacoes"], ea.bestsol.getGenes()))
+    assert res[1][0] < res[0][0] == 100 + 21 * 50 and res[1][1] == res[0][1]
+    print("Avaliacoes sem/com cache:", res[0][0], res[1][0])
 def test1():
     ea = EvolAlgorithm(100, 20, 50, 100)#mais complexo porque tem mais individuos (100)
     ea.run()
@@ -55,3 +145,4 @@ def test1():
 
 if __name__ == "__main__":
     test()
+    testCache()
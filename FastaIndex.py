@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+
+from MySeq import MySeq
+
+# Índice igual ao .fai do samtools: para cada registo guarda
+# nome -> (comprimento da seq, offset em bytes do início da seq, bases por linha, bytes por linha)
+# Com isto a base i do registo está no byte offset + (i // bases por linha) * bytes por linha + i % bases por linha.
+
+
+def buildIndex(path):
+    """Lê o FASTA uma vez (linha a linha, sem guardar as seqs) e devolve o {} do índice, pela ordem do ficheiro"""
+    res = {}
+    nome = None
+    with open(path, "rb", buffering=1 << 22) as f:
+        pos = 0
+        for linha in f:
+            tam = len(linha)
+            if linha[:1] == b">":
+                if nome is not None:
+                    res[nome] = (comp, offset, lb, lw)
+                nome = linha[1:].split(None, 1)[0].decode("ascii") if linha[1:].strip() else ""
+                if nome in res:
+                    raise ValueError("Nome repetido no FASTA: " + nome)
+                comp, offset, lb, lw = 0, pos + tam, 0, 0
+                ultima = False #já apareceu uma linha mais curta, a seguinte teria de ser a última
+            elif nome is not None:
+                bases = len(linha.rstrip(b"\r\n"))
+                if bases:
+                    if ultima or (lb and bases > lb):
+                        raise ValueError("Linhas com tamanhos diferentes no registo " + nome)
+                    if lb == 0:
+                        lb, lw = bases, tam
+                    elif bases < lb or tam != lw:
+                        ultima = True
+                    comp += bases
+                else:
+                    ultima = comp > 0
+            pos += tam
+        if nome is not None:
+            res[nome] = (comp, offset, lb, lw)
+    return res
+
+def writeFai(index, path):
+    with open(path, "w") as f:
+        for nome, (comp, offset, lb, lw) in index.items():
+            f.write(f"{nome}\t{comp}\t{offset}\t{lb}\t{lw}\n")
+
+def readFai(path):
+    res = {}
+    with open(path) as f:
+        for linha in f:
+            campos = linha.rstrip("\n").split("\t")
+            res[campos[0]] = tuple(int(x) for x in campos[1:5])
+    return res
+
+
+class FastaIndexada:
+    """FASTA mapeado em memória com acesso aleatório a regiões. Usa o .fai ao lado do ficheiro se existir e for mais
+    recente do que o FASTA; senão constrói o índice (e tenta guardá-lo)."""
+
+    def __init__(self, path, tipo="dna"):
+        self.path = path
+        self.tipo = tipo
+        fai = path + ".fai"
+        if os.path.exists(fai) and os.path.getmtime(fai) >= os.path.getmtime(path):
+            self.index = readFai(fai)
+        else:
+            self.index = buildIndex(path)
+            try:
+                writeFai(self.index, fai)
+            except OSError: #sem permissões de escrita, o índice fica só em memória
+                pass
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, nome):
+        return nome in self.index
+
+    def __getitem__(self, nome): #devolve a seq sem a ler do disco
+        if nome not in self.index:
+            raise KeyError(nome)
+        return MySeqLazy(self, nome)
+
+    def nomes(self):
+        return list(self.index)
+
+    def seqLen(self, nome):
+        return self.index[nome][0]
+
+    def fetch(self, nome, i, j):
+        """Devolve a região [i, j) do registo nome como str, lendo só os bytes dessa região"""
+        comp, offset, lb, lw = self.index[nome]
+        i, j = max(i, 0), min(j, comp)
+        if j <= i: return ""
+        a = offset + (i // lb) * lw + i % lb
+        b = offset + ((j - 1) // lb) * lw + (j - 1) % lb + 1
+        raw = self.mm[a:b]
+        if b - a != j - i: #a região atravessa mudanças de linha
+            raw = raw.replace(b"\n", b"").replace(b"\r", b"")
+        return raw.decode("ascii", "replace").upper()
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+
+
+class MySeqLazy(MySeq):
+    """Seq de um FastaIndexada: len, indexação e fatias só leem as bases pedidas; os métodos herdados de MySeq, que
+    usam self.seq, leem a seq toda quando são chamados"""
+
+    def __init__(self, fasta, nome):
+        self.fasta = fasta
+        self.nome = nome
+        self.tipo = fasta.tipo
+        self.qualidade = None
+        self.n = fasta.seqLen(nome)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def seq(self):
+        return self.fasta.fetch(self.nome, 0, self.n)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            i, j, passo = n.indices(self.n)
+            if passo == 1:
+                return self.fasta.fetch(self.nome, i, j)
+            lo, hi = (i, j) if passo > 0 else (j + 1, i + 1)
+            return self.fasta.fetch(self.nome, lo, hi)[(i - lo)::passo] if hi > lo else ""
+        if n < 0: n += self.n
+        if n < 0 or n >= self.n:
+            raise IndexError("índice fora da sequência")
+        return self.fasta.fetch(self.nome, n, n + 1)
+
+    def regiao(self, i, j): #subseq [i, j) como MySeq normal
+        return MySeq(self.fasta.fetch(self.nome, i, j), self.tipo, self.nome)
+
+
+def test():
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "ex.fa")
+    with open(path, "w") as f:
+        f.write(">chr1 teste\nACGTACGTAC\nGTTTGGCCAA\nACG\n>chr2\nTTTTAAAACCCC\n")
+    fa = FastaIndexada(path)
+    print(fa.index)
+    s = fa["chr1"]
+    print(len(s), s[8:14], s[-1], s.regiao(0, 5))
+    print(fa["chr2"][::2])
+
+if __name__ == "__main__":
+    test()
@@ -90,7 +90,7 @@ class Indiv:
 
 class IndivInt (Indiv):
 
-    def __init__(self, size, genes=[], lb=0, ub=1): #ub = tamanho da seq menos o tamanjo do motif
+    def __init__(self, size, genes=[], lb=0, ub=1): #ub = tamanho da seq menos o tamanjo do motif (ou uma lista com um ub por posicao)
         self.lb = lb
         self.ub = ub
         self.genes = genes
@@ -98,15 +98,18 @@ class IndivInt (Indiv):
         if not self.genes:
             self.initRandom(size)
 
+    def limite(self, i): #ub da posicao i
+        return self.ub[i] if isinstance(self.ub, list) else self.ub
+
     def initRandom(self, size): #gerar os individuos aleatoriamente
         self.genes = []
-        for _ in range(size):
-            self.genes.append(randint(0, self.ub))
+        for i in range(size):
+            self.genes.append(randint(0, self.limite(i)))
 
     def mutation(self):
         s = len(self.genes) #len dos genes
         pos = randint(0, s-1) #escolher uma posicao aleatoria
-        self.genes[pos] = randint(0, self.ub) #substituir esse posicao por um valor aleatorio ente 0 e ub
+        self.genes[pos] = randint(0, self.limite(pos)) #substituir esse posicao por um valor aleatorio ente 0 e ub
 
 
 class IndivReal(Indiv):
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import os
+from array import array
+from multiprocessing import Pool
+from operator import add
+
+from MySeq import MySeq, tabelaCodificacao
+
+# Cada k-mer é um inteiro de 2k bits (A=0, C=1, G=2, T=3, a primeira base nos bits mais altos), calculado a rolar
+# pela seq: x = ((x << 2) | c) & mascara. O complemento inverso rola ao mesmo tempo, rc = (rc >> 2) | ((3-c) << 2(k-1)),
+# e o k-mer canónico é o menor dos dois. Uma base fora do alfabeto (N, ...) reinicia a janela.
+
+DENSO_MAX = 11 #até este k as contagens ficam num array denso de 4^k posições, acima disso num {} de inteiros
+CODIFICA_DNA = tabelaCodificacao("ACGT")
+CODIFICA_RNA = tabelaCodificacao("ACGU")
+
+
+def codigosDe(seq): #bytes de códigos 0..3 de uma MySeq/MySeqPacked, str ou bytes já codificados
+    if isinstance(seq, MySeq):
+        return seq.codifica()
+    if isinstance(seq, str):
+        seq = seq.encode("ascii", "replace")
+        return seq.translate(CODIFICA_RNA if b"U" in seq or b"u" in seq else CODIFICA_DNA)
+    return bytes(seq)
+
+def codificaKmer(kmer): #str -> inteiro
+    x = 0
+    for c in kmer.upper():
+        x = (x << 2) | "ACGT".index(c if c != "U" else "T")
+    return x
+
+def descodificaKmer(x, k, alf="ACGT"): #inteiro -> str
+    return "".join(alf[(x >> (2*(k - 1 - i))) & 3] for i in range(k))
+
+def compInversoKmer(x, k):
+    rc = 0
+    for _ in range(k):
+        rc = (rc << 2) | (3 - (x & 3))
+        x >>= 2
+    return rc
+
+def canonico(x, k):
+    return min(x, compInversoKmer(x, k))
+
+def kmersIter(seq, k, canonico=False):
+    """Gerador de (posição, k-mer inteiro) de todos os k-mers de seq que não contêm bases inválidas"""
+    mascara = (1 << (2*k)) - 1
+    desl = 2*(k - 1)
+    x = rc = 0
+    validas = 0
+    for pos, c in enumerate(codigosDe(seq)):
+        if c > 3:
+            validas = 0
+            continue
+        x = ((x << 2) | c) & mascara
+        rc = (rc >> 2) | ((3 - c) << desl)
+        validas += 1
+        if validas >= k:
+            yield pos - k + 1, (rc if canonico and rc < x else x)
+
+
+class KmerCounter:
+
+    def __init__(self, k, canonico=False):
+        self.k = k
+        self.canonico = canonico
+        self.denso = k <= DENSO_MAX
+        self.counts = array("I", bytes(4 * (4 ** k))) if self.denso else {}
+
+    def __getitem__(self, kmer):
+        x = codificaKmer(kmer) if isinstance(kmer, str) else kmer
+        if self.canonico: x = canonico(x, self.k)
+        return self.counts[x] if self.denso else self.counts.get(x, 0)
+
+    def __len__(self): #nº de k-mers distintos
+        if self.denso:
+            return len(self.counts) - self.counts.count(0)
+        return len(self.counts)
+
+    def total(self):
+        return sum(self.counts) if self.denso else sum(self.counts.values())
+
+    def contaSeq(self, seq):
+        """Conta os k-mers de uma seq (MySeq, MySeqPacked, str ou bytes de códigos), numa só passagem"""
+        k = self.k
+        mascara = (1 << (2*k)) - 1
+        desl = 2*(k - 1)
+        counts = self.counts
+        canon = self.canonico
+        denso = self.denso
+        x = rc = 0
+        validas = 0
+        for c in codigosDe(seq): #o ciclo é o de kmersIter, escrito aqui sem gerador por ser o ponto quente
+            if c > 3:
+                validas = 0
+                continue
+            x = ((x << 2) | c) & mascara
+            validas += 1
+            if canon:
+                rc = (rc >> 2) | ((3 - c) << desl)
+            if validas >= k:
+                y = rc if canon and rc < x else x
+                if denso:
+                    counts[y] += 1
+                else:
+                    counts[y] = counts.get(y, 0) + 1
+        return self
+
+    def conta(self, seqs):
+        for s in seqs:
+            self.contaSeq(s)
+        return self
+
+    def merge(self, outro): #soma as contagens de outro contador (por exemplo vindo de outro processo)
+        if (outro.k, outro.canonico) != (self.k, self.canonico):
+            raise ValueError("Só se podem juntar contadores com o mesmo k e o mesmo modo canónico")
+        if self.denso:
+            self.counts = array("I", map(add, self.counts, outro.counts))
+        else:
+            for x, n in outro.counts.items():
+                self.counts[x] = self.counts.get(x, 0) + n
+        return self
+
+    def itemsInt(self): #(k-mer inteiro, contagem) dos k-mers presentes, por ordem crescente do inteiro
+        if self.denso:
+            return [(x, n) for x, n in enumerate(self.counts) if n]
+        return sorted(self.counts.items())
+
+    def items(self): #(k-mer, contagem) ordenados alfabeticamente
+        return [(descodificaKmer(x, self.k), n) for x, n in self.itemsInt()]
+
+    def espectro(self): #{frequência: nº de k-mers distintos com essa frequência}
+        res = {}
+        for n in (self.counts if self.denso else self.counts.values()):
+            if n:
+                res[n] = res.get(n, 0) + 1
+        return dict(sorted(res.items()))
+
+
+# Contagem em paralelo
+
+def partes(cods, tamanho, k): #divide os códigos em pedaços que se sobrepõem em k-1 bases, para não perder k-mers
+    if len(cods) <= tamanho:
+        return [cods]
+    return [cods[i:i + tamanho + k - 1] for i in range(0, len(cods) - k + 1, tamanho)]
+
+def grupos(pedacos, n):
+    """Reparte os pedaços por n grupos com nº de bases parecido (cada pedaço, do maior para o menor, vai para o grupo
+    com menos bases)"""
+    heap = [(0, g) for g in range(n)]
+    res = [[] for _ in range(n)]
+    for p in sorted(pedacos, key=len, reverse=True):
+        total, g = heapq.heappop(heap)
+        res[g].append(p)
+        heapq.heappush(heap, (total + len(p), g))
+    return [g for g in res if g]
+
+def contaGrupo(args): #um só contador para todos os pedaços do grupo
+    k, canon, pedacos = args
+    kc = KmerCounter(k, canon)
+    for p in pedacos:
+        kc.contaSeq(p)
+    return kc
+
+def contaParalelo(seqs, k, canonico=False, processos=None, tamanho=1 << 20):
+    """Conta os k-mers de várias seqs num conjunto de processos: cada seq é codificada aqui e partida em pedaços de
+    ~tamanho bases, e os pedaços são repartidos por um grupo por processo. Cada processo conta o seu grupo num só
+    contador, por isso só volta um contador por processo (com k <= DENSO_MAX é um array de 4^k posições) e o merge é
+    feito uma vez por processo, não uma vez por pedaço."""
+    if processos is None: processos = os.cpu_count() or 1
+    pedacos = [p for s in seqs for p in partes(codigosDe(s), tamanho, k)]
+    trabalho = [(k, canonico, g) for g in grupos(pedacos, processos)]
+    if not trabalho:
+        return KmerCounter(k, canonico)
+    with Pool(processos) as pool:
+        parciais = pool.imap_unordered(contaGrupo, trabalho)
+        res = next(parciais)
+        for parcial in parciais:
+            res.merge(parcial)
+    return res
+
+
+def test():
+    s = MySeq("ATGCAATGGTCTGNNACGT")
+    kc = KmerCounter(3).contaSeq(s)
+    print(kc.items())
+    print(kc["ATG"], len(kc), kc.total(), kc.espectro())
+    kc2 = KmerCounter(3, canonico=True).contaSeq(s)
+    print(kc2["CAT"], kc2["ATG"])
+
+if __name__ == "__main__":
+    test()
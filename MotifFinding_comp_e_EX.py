@@ -1,13 +1,479 @@
 # -*- coding: utf-8 -*-
 
 
-from MySeq import MySeq
-from MyMotifs import MyMotifs
+import math
+import os
+import random
+from itertools import compress, product
+from multiprocessing import Pool, Value
+from operator import add, attrgetter, mul
+
+from MySeq import MySeq, compInversoCodigos
+from MyMotifs import MyMotifs, argmax, codigosSeq, tabelasColunas, varreColunas, varreJanelas
+
+
+def seqCurta(seq, i, size): #mensagem de erro de uma seq sem nenhuma janela do tamanho do motif
+    return f"A seq {seq.nome or i} tem {len(seq)} letras, menos do que o tamanho do motif ({size})"
+
+
+class JanelasCodificadas:
+    """Todas as janelas candidatas de um conjunto de seqs para um tamanho de motif: cada seq é codificada uma vez
+    (índices no alfabeto, MySeq.codifica) e guardada com o seu comprimento, sem padding, e a janela p da seq i é a fatia
+    cods[i][p:p+size], sem criar strings nem MySeq. Com ambasCadeias as janelas nDiretas[i].. da seq i são as do
+    complemento inverso (inv[i]), pela ordem em que aparecem nele. As probabilidades de todas as janelas de uma seq
+    calculam-se de uma vez com varreColunas."""
+
+    def __init__(self, seqs, size, ambasCadeias=False):
+        self.size = size
+        self.alphabet = seqs[0].alfabeto()
+        self.cods = [s.codifica() for s in seqs]
+        self.nDiretas = [len(c) - size + 1 for c in self.cods]
+        for i, n in enumerate(self.nDiretas):
+            if n <= 0: raise ValueError(seqCurta(seqs[i], i, size))
+        if ambasCadeias:
+            if self.alphabet not in ("ACGT", "ACGU"):
+                raise ValueError("Só há cadeia complementar em seqs de DNA/RNA")
+            self.inv = [compInversoCodigos(c) for c in self.cods]
+            self.nJanelas = [2 * n for n in self.nDiretas]
+        else:
+            self.inv = None
+            self.nJanelas = self.nDiretas
+
+    def partes(self, i): #[(códigos, índice da primeira janela)] das cadeias da seq i
+        if self.inv is None: return [(self.cods[i], 0)]
+        return [(self.cods[i], 0), (self.inv[i], self.nDiretas[i])]
+
+    def janela(self, i, p):
+        q = p - self.nDiretas[i]
+        return self.cods[i][p:p + self.size] if q < 0 else self.inv[i][q:q + self.size]
+
+    def posicao(self, i, p): #(início da janela p na cadeia direta, cadeia)
+        q = p - self.nDiretas[i]
+        return (p, "+") if q < 0 else (len(self.cods[i]) - self.size - q, "-")
+
+    def colunas(self, i): #colunas[j][p] = letra j da janela p da seq i (fatias dos códigos, juntas só com ambasCadeias)
+        nd = self.nDiretas[i]
+        if self.inv is None:
+            return [self.cods[i][j:j + nd] for j in range(self.size)]
+        return [self.cods[i][j:j + nd] + self.inv[i][j:j + nd] for j in range(self.size)]
+
+    def probabilidades(self, i, pwm): #probabilidade de cada janela da seq i segundo a pwm (nalf x size)
+        return varreColunas(self.colunas(i), tabelasColunas(pwm, 0.0), mul)
+
+    def umQuente(self, i):
+        """[(posição, inteiro)] das janelas da seq i sem letras inválidas, cada letra com nalf bits e só o bit do seu
+        índice ligado (a primeira letra nos bits mais altos). Entre duas janelas assim popcount(x ^ y) é o dobro da
+        distância de Hamming."""
+        nalf, size = len(self.alphabet), self.size
+        mascara = (1 << (nalf * size)) - 1
+        res = []
+        for cods, ini in self.partes(i):
+            x = validas = 0
+            for pos, c in enumerate(cods):
+                if c >= nalf:
+                    validas = 0
+                    continue
+                x = ((x << nalf) | (1 << c)) & mascara
+                validas += 1
+                if validas >= size: res.append((ini + pos - size + 1, x))
+        return res
+
+    def indicePrefixos(self, i): #indice[m] = prefixos distintos de tamanho m (m = 0..size) das janelas da seq i
+        nalf, size = len(self.alphabet), self.size
+        janelas = [x for _, x in self.umQuente(i)]
+        return [list({x >> (nalf * (size - m)) for x in janelas}) for m in range(size + 1)]
+
+
+class EstadoScore:
+    """Estado do score de um conjunto de posições iniciais: a matriz de contagens (por coluna) das janelas escolhidas,
+    o máximo de cada coluna e a soma desses máximos. Mudar a posição de uma seq é tirar a janela antiga e pôr a nova,
+    O(tamanho do motif), em vez de construir um MyMotifs novo a cada score."""
+
+    def __init__(self, janelas):
+        self.size = size = janelas.size
+        self.nalf = len(janelas.alphabet)
+        self.cods = janelas.cods
+        self.inv = janelas.inv
+        self.nDiretas = janelas.nDiretas
+        self.counts = [[0] * self.nalf for _ in range(size)] #counts[coluna][letra]
+        self.maxCol = [0] * size
+        self.total = 0 #soma dos maxCol, é o score
+        self.pos = [None] * len(self.cods) #posição da janela de cada seq (None se a seq não entra)
+        self.n = 0 #nº de janelas no estado
+
+    def adiciona(self, i, p):
+        counts, maxCol, nalf = self.counts, self.maxCol, self.nalf
+        q = p - self.nDiretas[i]
+        for j, a in enumerate(self.cods[i][p:p + self.size] if q < 0 else self.inv[i][q:q + self.size]):
+            if a < nalf: #letras inválidas não contam
+                col = counts[j]
+                c = col[a] + 1
+                col[a] = c
+                if c > maxCol[j]: #o máximo só pode subir 1
+                    maxCol[j] = c
+                    self.total += 1
+        self.pos[i] = p
+        self.n += 1
+
+    def remove(self, i):
+        counts, maxCol, nalf = self.counts, self.maxCol, self.nalf
+        p = self.pos[i]
+        q = p - self.nDiretas[i]
+        for j, a in enumerate(self.cods[i][p:p + self.size] if q < 0 else self.inv[i][q:q + self.size]):
+            if a < nalf:
+                col = counts[j]
+                c = col[a]
+                col[a] = c - 1
+                if c == maxCol[j] and max(col) < c: #era o único máximo da coluna
+                    maxCol[j] = c - 1
+                    self.total -= 1
+        self.pos[i] = None
+        self.n -= 1
+
+    def muda(self, i, p): #põe a janela da seq i na posição p (None para tirar a seq)
+        if self.pos[i] == p: return
+        if self.pos[i] is not None: self.remove(i)
+        if p is not None: self.adiciona(i, p)
+
+    def define(self, s):
+        """Deixa o estado com as posições de s, mexendo só nas que mudaram (as seqs a seguir a len(s) ficam de fora,
+        como numa solução parcial do branch and bound) e devolve o score"""
+        pos = self.pos
+        for i, p in enumerate(s):
+            if pos[i] != p: self.muda(i, p)
+        if self.n > len(s):
+            for i in range(len(s), len(pos)):
+                if pos[i] is not None: self.remove(i)
+        return self.total
+
+    def pwm(self, pseudo=0.0): #perfil das janelas no estado: (contagem + pseudo) / nº de janelas
+        n = self.n
+        if n == 0: return [[1.0 / self.nalf] * self.size for _ in range(self.nalf)] #perfil vazio: uniforme
+        return [[(col[a] + pseudo) / n for col in self.counts] for a in range(self.nalf)]
+
+    def scoreMult(self): #produto dos máximos da PWM (máximo das contagens / nº de seqs)
+        res = 1.0
+        for m in self.maxCol:
+            res *= m / self.n
+        return res
+
+
+# Procura exaustiva em paralelo: o espaço das posições é partido pelas posições das primeiras seqs (o prefixo) e cada
+# processo percorre todas as soluções de um prefixo com o seu próprio EstadoScore. O melhor score já encontrado fica
+# num Value partilhado e um prefixo só é percorrido se o seu majorante o puder igualar.
+
+PARTILHADO = {}
+
+def iniciaProcura(janelas, limites, melhor):
+    PARTILHADO["estado"] = EstadoScore(janelas)
+    PARTILHADO["limites"] = limites #última posição possível em cada seq
+    PARTILHADO["melhor"] = melhor
+
+def exaustivaPrefixo(prefixo):
+    """Percorre por ordem lexicográfica (a de nextSol) as soluções que começam por prefixo, mudando no estado só as
+    posições que mudam. Devolve (nº de avaliações, (score, solução)) da primeira solução com o maior score, com None
+    em vez de (score, solução) se o prefixo foi cortado pelo melhor score partilhado."""
+    estado, limites, melhor = PARTILHADO["estado"], PARTILHADO["limites"], PARTILHADO["melhor"]
+    n, k = len(limites), len(prefixo)
+    if estado.define(prefixo) + (n - k) * estado.size < melhor.value:
+        return 1, None
+    avaliacoes = math.prod(l + 1 for l in limites[k:]) #todas as soluções do prefixo
+    s = list(prefixo) + [0] * (n - k)
+    melhorScore = estado.define(s)
+    res = list(s)
+    while True:
+        pos = n - 1
+        while pos >= k and s[pos] == limites[pos]:
+            pos -= 1
+        if pos < k: break
+        s[pos] += 1
+        estado.muda(pos, s[pos])
+        for i in range(pos + 1, n):
+            s[i] = 0
+            estado.muda(i, 0)
+        if estado.total > melhorScore:
+            melhorScore = estado.total
+            res = list(s)
+    with melhor.get_lock():
+        if melhorScore > melhor.value: melhor.value = melhorScore
+    return avaliacoes, (melhorScore, res)
+
+def prefixos(limites, unidades):
+    """Prefixos (posições das primeiras seqs, por ordem lexicográfica) que partem o espaço em pelo menos unidades
+    partes, sem nunca fixar a última seq. Devolve (iterador dos prefixos, nº de prefixos)."""
+    nivel, total = 0, 1
+    while nivel < len(limites) - 1 and total < unidades:
+        total *= limites[nivel] + 1
+        nivel += 1
+    return product(*[range(l + 1) for l in limites[:nivel]]), total
+
+
+# Branch and bound: o majorante de uma solução parcial com as k primeiras seqs é, coluna a coluna, o maior valor de
+# contagem atual + nº das seqs k.. que têm essa letra nessa coluna em alguma janela. Cada seq que falta só pode somar
+# 1 à contagem de uma letra numa coluna e só se alguma das suas janelas a tiver lá, por isso o majorante é admissível
+# e nunca é pior do que score + (nº de seqs que faltam) * tamanho do motif.
+
+def letrasPossiveis(janelas): #R[k][j][a] = nº de seqs i >= k com a letra a na coluna j de alguma janela
+    nalf = len(janelas.alphabet)
+    R = [[[0] * nalf for _ in range(janelas.size)]]
+    for i in range(len(janelas.cods) - 1, -1, -1):
+        linha = []
+        for col, rcol in zip(janelas.colunas(i), R[-1]):
+            tem = set(col)
+            linha.append([c + (a in tem) for a, c in enumerate(rcol)])
+        R.append(linha)
+    return R[::-1]
+
+def majorante(counts, r):
+    return sum(max(map(add, col, rcol)) for col, rcol in zip(counts, r))
+
+def iniciaBB(janelas, limites, melhor):
+    iniciaProcura(janelas, limites, melhor)
+    PARTILHADO["possiveis"] = letrasPossiveis(janelas)
+
+def bbSubarvore(prefixo):
+    """Branch and bound em profundidade por baixo de prefixo, pela ordem de nextVertex, com o score parcial mantido
+    no EstadoScore (descer põe uma janela, passar ao irmão muda-a, subir tira-a). Um ramo é cortado se o majorante
+    não passar o melhor score deste ramo ou se ficar abaixo do melhor score partilhado. Devolve (nº de avaliações,
+    (score, solução)) da primeira solução com o maior score encontrado, com None se não encontrou nenhuma; cada nó
+    avaliado (majorante ou score de uma folha) é uma avaliação."""
+    estado, limites, melhor, R = PARTILHADO["estado"], PARTILHADO["limites"], PARTILHADO["melhor"], \
+        PARTILHADO["possiveis"]
+    n, k0 = len(limites), len(prefixo)
+    estado.define(prefixo)
+    if majorante(estado.counts, R[k0]) < melhor.value:
+        return 1, None
+    s = list(prefixo) + [0] * (n - k0)
+    res = [-1, None]
+    avaliacoes = [1]
+
+    def desce(k): #as seqs < k já estão no estado
+        avaliacoes[0] += limites[k] + 1
+        for p in range(limites[k] + 1):
+            s[k] = p
+            estado.muda(k, p)
+            if k == n - 1:
+                if estado.total > res[0]:
+                    res[0], res[1] = estado.total, list(s)
+                    with melhor.get_lock():
+                        if res[0] > melhor.value: melhor.value = res[0]
+            else:
+                b = majorante(estado.counts, R[k + 1])
+                if b > res[0] and b >= melhor.value: desce(k + 1)
+        estado.muda(k, None)
+
+    if k0 == n:
+        return 1, (estado.total, s)
+    desce(k0)
+    return avaliacoes[0], (None if res[1] is None else tuple(res))
+
+
+# Heurísticas sobre o perfil: juntar uma janela ao estado faz subir 1 o máximo de cada coluna onde a sua letra é uma
+# das letras com contagem máxima, por isso o score com cada janela candidata de uma seq sai de uma só varreColunas com
+# tabelas 0/1.
+
+def ganhos(estado, colunas): #aumento do score do estado ao juntar cada janela (colunas de JanelasCodificadas.colunas)
+    tabs = []
+    for col, m in zip(estado.counts, estado.maxCol):
+        tab = [0] * 256
+        for a, c in enumerate(col):
+            if c == m: tab[a] = 1
+        tabs.append(tab)
+    return varreColunas(colunas, tabs, add)
+
+def subidaEstocastica(janelas, estado, rnd):
+    """heuristicStochastic a partir de posições aleatórias sorteadas com rnd: repete perfil -> janela mais provável de
+    cada seq enquanto o score melhorar. Devolve (melhor score, posições, nº de avaliações): cada janela candidata
+    posta contra o perfil e cada solução pontuada conta uma."""
+    s = [rnd.randint(0, nj - 1) for nj in janelas.nJanelas]
+    melhorScore = estado.define(s)
+    avaliacoes, porRonda = 1, sum(janelas.nJanelas) + 1
+    while True:
+        pwm = estado.pwm()
+        novo = [argmax(janelas.probabilidades(i, pwm)) for i in range(len(s))]
+        scr = estado.define(novo)
+        avaliacoes += porRonda
+        if scr <= melhorScore: return melhorScore, s, avaliacoes
+        melhorScore, s = scr, novo
+
+def iniciaJanelas(janelas):
+    PARTILHADO["janelas"] = janelas
+    PARTILHADO["estado"] = EstadoScore(janelas)
+
+def estocasticaTrabalho(semente):
+    return subidaEstocastica(PARTILHADO["janelas"], PARTILHADO["estado"], random.Random(semente))
+
+
+# Gibbs sampling com várias cadeias: cada processo recebe as janelas codificadas uma vez (initializer) e corre cadeias
+# independentes, cada uma com a sua semente e o seu EstadoScore. Em cada passo tira-se a janela de uma seq do perfil,
+# todas as janelas dessa seq são avaliadas de uma vez com a PSSM log-odds do perfil (varreColunas) e a nova posição é
+# sorteada com pesos exp(score / temperatura); a temperatura desce de temperatura até 1 ao longo da cadeia.
+
+def composicaoFundo(janelas): #frequência de cada letra em todas as seqs (modelo de fundo)
+    nalf = len(janelas.alphabet)
+    conta = [sum(c.count(a) for i in range(len(janelas.cods)) for c, _ in janelas.partes(i)) for a in range(nalf)]
+    total = sum(conta)
+    return [x / total if total else 1.0 / nalf for x in conta]
+
+def tabelasLogOdds(estado, fundo, pseudo):
+    """Tabelas por coluna (para varreColunas) da PSSM log-odds das janelas no estado: log((contagem + pseudo*fundo) /
+    (n + pseudo)) - log(fundo); letras inválidas ficam com -inf"""
+    logFundo = [math.log(f) if f > 0 else 0.0 for f in fundo]
+    n = estado.n + pseudo
+    res = []
+    for col in estado.counts:
+        tab = [-math.inf] * 256
+        for a, c in enumerate(col):
+            x = c + pseudo * fundo[a]
+            tab[a] = math.log(x / n) - logFundo[a] if x > 0 else -math.inf
+        res.append(tab)
+    return res
+
+def sorteiaLog(rnd, scores, temperatura):
+    """Índice sorteado com pesos exp(score / temperatura), calculados a partir do máximo para não haver overflow"""
+    m = max(scores)
+    if m == -math.inf: return rnd.randrange(len(scores))
+    pesos = [math.exp((x - m) / temperatura) for x in scores]
+    return rnd.choices(range(len(scores)), pesos)[0]
+
+def iniciaGibbs(janelas, fundo):
+    iniciaJanelas(janelas)
+    PARTILHADO["fundo"] = fundo
+
+def cadeiaGibbs(args):
+    """Corre uma cadeia. Se o melhor score não melhorar em paciencia iterações a cadeia convergiu: recomeça de
+    posições aleatórias enquanto houver reinícios, senão acaba. Devolve (melhor score, posições, nº de avaliações),
+    com uma avaliação por janela candidata pontuada."""
+    semente, iteracoes, pseudo, temperatura, paciencia, reinicios = args
+    janelas, estado, fundo = PARTILHADO["janelas"], PARTILHADO["estado"], PARTILHADO["fundo"]
+    rnd = random.Random(semente)
+    n = len(janelas.cods)
+    s = [rnd.randrange(nj) for nj in janelas.nJanelas]
+    estado.define(s)
+    melhorScore, melhor = estado.total, list(s)
+    ultimaMelhoria = 0
+    avaliacoes = 0
+    for it in range(iteracoes):
+        t = temperatura ** (1.0 - it / iteracoes) #de temperatura até 1
+        i = rnd.randrange(n)
+        estado.muda(i, None)
+        scores = varreColunas(janelas.colunas(i), tabelasLogOdds(estado, fundo, pseudo), add)
+        avaliacoes += len(scores)
+        s[i] = sorteiaLog(rnd, scores, t)
+        estado.muda(i, s[i])
+        if estado.total > melhorScore:
+            melhorScore, melhor = estado.total, list(s)
+            ultimaMelhoria = it
+        elif it - ultimaMelhoria >= paciencia:
+            if reinicios == 0: break
+            reinicios -= 1
+            s = [rnd.randrange(nj) for nj in janelas.nJanelas]
+            estado.define(s)
+            ultimaMelhoria = it
+    return melhorScore, melhor, avaliacoes
+
+
+# EM (como no MEME): o modelo é uma PWM para as janelas do motif e a composição de fundo para o resto. O passo E dá a
+# probabilidade de o motif começar em cada janela de cada seq (com os scores log-odds de todas as janelas de uma seq
+# calculados de uma vez) e o passo M volta a calcular a PWM a partir das contagens esperadas. Modelos: "oops" (uma
+# ocorrência por seq) e "zoops" (zero ou uma, com a fração gama de seqs com motif também estimada).
+
+def emPosteriores(janelas, pwm, fundo, modelo, gama):
+    """Passo E. Devolve (lista com as probabilidades de cada janela de cada seq, log verosimilhança em relação ao
+    modelo só de fundo)."""
+    logFundo = [math.log(f) if f > 0 else math.inf for f in fundo]
+    tabelas = tabelasColunas([[math.log(x) - logFundo[a] if x > 0 else -math.inf for x in linha]
+                              for a, linha in enumerate(pwm)], -math.inf)
+    Z, logv = [], 0.0
+    for i, nj in enumerate(janelas.nJanelas):
+        lr = varreColunas(janelas.colunas(i), tabelas, add) if nj else []
+        m = max(lr) if lr else -math.inf
+        if m == -math.inf: #nenhuma janela válida
+            Z.append([0.0] * nj)
+            if modelo == "zoops": logv += math.log(1 - gama)
+            continue
+        pesos = list(map(math.exp, map((-m).__add__, lr)))
+        soma = sum(pesos)
+        if modelo == "oops":
+            Z.append([x / soma for x in pesos])
+            logv += m + math.log(soma / nj)
+        else:
+            lam = gama / nj
+            den = (1 - gama) * math.exp(min(-m, 700.0)) + lam * soma
+            Z.append([lam * x / den for x in pesos])
+            logv += m + math.log(den)
+    return Z, logv
+
+def emPWM(janelas, Z, fundo, pseudo):
+    """Passo M: contagens esperadas de cada letra em cada coluna (a soma das probabilidades das janelas que têm essa
+    letra nessa coluna, com compress) mais pseudo * fundo, normalizadas por coluna"""
+    nalf, size = len(janelas.alphabet), janelas.size
+    contagens = [[pseudo * fundo[a]] * size for a in range(nalf)]
+    marcas = [bytes(int(c == a) for c in range(256)) for a in range(nalf)] #tabelas para translate: a -> 1, resto -> 0
+    for i, z in enumerate(Z):
+        nd = janelas.nDiretas[i]
+        for cods, ini in janelas.partes(i):
+            zc = z if ini == 0 and nd == len(z) else z[ini:ini + nd]
+            for a in range(nalf):
+                marca = cods.translate(marcas[a]) #1 onde está a letra a, 0 no resto
+                linha = contagens[a]
+                for j in range(size):
+                    linha[j] += sum(compress(zc, marca[j:j + nd]))
+    totais = [sum(contagens[a][j] for a in range(nalf)) for j in range(size)]
+    return [[c / t for c, t in zip(linha, totais)] for linha in contagens]
+
+def pwmInicial(janelas, i, p, beta=0.5): #PWM que começa na janela p da seq i: beta para a sua letra em cada coluna
+    nalf = len(janelas.alphabet)
+    pwm = [[(1 - beta) / (nalf - 1)] * janelas.size for _ in range(nalf)]
+    for j, a in enumerate(janelas.janela(i, p)):
+        if a < nalf: pwm[a][j] = beta
+        else:
+            for b in range(nalf): pwm[b][j] = 1.0 / nalf
+    return pwm
+
+def correEM(janelas, fundo, pwm, modelo="oops", iteracoes=100, pseudo=0.1, tol=1e-6):
+    """Itera E/M até a log verosimilhança mudar menos de tol (ou iteracoes). Devolve (log verosimilhança, pwm,
+    probabilidades das janelas, gama, nº de avaliações), com uma avaliação por janela pontuada num passo E."""
+    gama = 0.5 if modelo == "zoops" else 1.0
+    anterior = -math.inf
+    porPasso, passos = sum(janelas.nJanelas), 1
+    for _ in range(iteracoes):
+        passos += 1
+        Z, logv = emPosteriores(janelas, pwm, fundo, modelo, gama)
+        pwm = emPWM(janelas, Z, fundo, pseudo)
+        if modelo == "zoops":
+            gama = min(max(sum(map(sum, Z)) / len(Z), 1e-6), 1 - 1e-6)
+        if abs(logv - anterior) < tol: break
+        anterior = logv
+    Z, logv = emPosteriores(janelas, pwm, fundo, modelo, gama)
+    return logv, pwm, Z, gama, passos * porPasso
+
+def emTrabalho(args):
+    (i, p), modelo, iteracoes, pseudo, tol = args
+    janelas, fundo = PARTILHADO["janelas"], PARTILHADO["fundo"]
+    return correEM(janelas, fundo, pwmInicial(janelas, i, p), modelo, iteracoes, pseudo, tol)
+
+
+def propriedadeJanelas(nome):
+    """Atributo guardado em _nome que, quando lhe é dado um valor novo, deita fora as janelas codificadas do
+    MotifFinding (ver MotifFinding.janelas)"""
+    privado = "_" + nome
+    def muda(self, valor):
+        setattr(self, privado, valor)
+        self.invalidaJanelas()
+    return property(attrgetter(privado), muda)
+
 
 class MotifFinding:
+
+    seqs = propriedadeJanelas("seqs")
+    motifSize = propriedadeJanelas("motifSize")
+    ambasCadeias = propriedadeJanelas("ambasCadeias")
     
-    def __init__(self, size = 8, seqs = None):
+    def __init__(self, size = 8, seqs = None, ambasCadeias = False):
         self.motifSize = size #vai ver qual é o tamanho dos motifs a procurar se n for nenhum escolhido é 8
+        self.ambasCadeias = ambasCadeias #se True o motif também pode estar no complemento inverso de cada seq
+        self.avaliacoes = 0 #nº de avaliações feitas (soluções pontuadas ou janelas candidatas postas contra um perfil), somadas também as dos processos
         if (seqs != None): #se tivermos seqs o self.seqs vai ser seqs e o self.alphabet vai ser o alfabeto
             self.seqs = seqs
             self.alphabet = seqs[0].alfabeto()
@@ -22,53 +488,73 @@ class MotifFinding:
     
     def seqSize (self, i):
         return len(self.seqs[i]) #dá return ao comprimento da sequêndia i na lista self.seqs
+
+    def ultimaPosicao(self, i): #última posição inicial possível na seq i (com ambasCadeias as janelas da cadeia inversa vêm a seguir às diretas)
+        n = self.seqSize(i) - self.motifSize + 1
+        if n <= 0: raise ValueError(seqCurta(self.seqs[i], i, self.motifSize))
+        return 2 * n - 1 if self.ambasCadeias else n - 1
     
     def readFile(self, fic, t): #vai ler um ficheiro e adiciona-lo á nossa lista self.seqs, sendo o t o tipo de seq
         for s in open(fic, "r"):
             self.seqs.append(MySeq(s.strip().upper(),t))
         self.alphabet = self.seqs[0].alfabeto()
+        self.invalidaJanelas()
+
+    def readFasta(self, fic, t): #lê um FASTA/FASTQ (também em gzip) registo a registo, sem carregar o ficheiro de uma vez
+        from SeqReader import readSeqs
+        self.seqs.extend(readSeqs(fic, t))
+        self.alphabet = self.seqs[0].alfabeto()
+        self.invalidaJanelas()
+
+    def invalidaJanelas(self): #as janelas são calculadas de novo na próxima vez que forem precisas
+        self._janelas = self._estado = None
+
+    def janelas(self):
+        """Janelas codificadas e estado incremental do score destas seqs e deste tamanho de motif, calculados uma vez.
+        Dar um valor novo a seqs, motifSize ou ambasCadeias (ou ler seqs com readFile/readFasta) deita-os fora; as
+        seqs ficam fixas durante uma procura, e quem as mudar no sítio (mf.seqs.append, mudar a seq de uma MySeq) tem
+        de chamar invalidaJanelas."""
+        if self._janelas is None:
+            self._janelas = JanelasCodificadas(self.seqs, self.motifSize, self.ambasCadeias)
+            self._estado = EstadoScore(self._janelas)
+        return self._janelas
+
+    def estadoScore(self, s=None): #com s devolve o estado já com as posições de s
+        self.janelas()
+        if s is not None: self._estado.define(s)
+        return self._estado
+
+    def posicoesCadeias(self, s): #[(início na cadeia direta, cadeia)] das posições de s
+        return [self.janelas().posicao(i, p) for i, p in enumerate(s)]
         
         
     def createMotifFromIndexes(self, indexes): #recebe uma lista de númereos sendo esta composta pelo número onde cada seq vai começar a contar o motif()
         pseqs = []
         for i,ind in enumerate(indexes):
-            pseqs.append( MySeq(self.seqs[i][ind:(ind+self.motifSize)], self.seqs[i].tipo) ) #vai adicionar a pseqs (uma sequência i  onde começa o motif e onde vai acabar) mais o tipo de seq que é
+            q = ind - (self.seqSize(i) - self.motifSize + 1)
+            if self.ambasCadeias and q >= 0: #janela do complemento inverso
+                fim = self.seqSize(i) - q
+                pseqs.append(MySeq(self.seqs[i][fim - self.motifSize:fim], self.seqs[i].tipo).compInverso())
+            else:
+                pseqs.append( MySeq(self.seqs[i][ind:(ind+self.motifSize)], self.seqs[i].tipo) ) #vai adicionar a pseqs (uma sequência i  onde começa o motif e onde vai acabar) mais o tipo de seq que é
         return MyMotifs(pseqs) #vai correr os Mymotifs com a lista de motifs
         
     # SCORES
         
-    def score(self, s):
-        score = 0
-        motif = self.createMotifFromIndexes(s)
-        motif.doCounts() #vai cirar a matriz de contagens
-        mat = motif.counts #vai tranporta le para aqui
-        for j in range(len(mat[0])): #vai correr as colunas da matriz
-            maxcol = mat[0][j] #vai dizer que o maxcolun vai ser igual ao primeiro elemento da coluna
-            for i in range(1, len(mat)): #depois vai começar no segundo elemento da coluna e vai comparar com todos os elementos da coluna para ver qual é o maior
-                if mat[i][j] > maxcol: 
-                    maxcol = mat[i][j]
-            score += maxcol #vai adionar esse valor a coluna
-        return score
+    def score(self, s): #soma, coluna a coluna, do maior nº de ocorrências de uma letra (ver EstadoScore)
+        self.avaliacoes += 1
+        return self.estadoScore(s).total
    
     def scoreMult(self, s): #faz o mesmo de cima mas é com probabilidades e o score vem em probabilidade é por multiplicação
-        score = 1.0
-        motif = self.createMotifFromIndexes(s)
-        motif.createPWM()
-        mat = motif.pwm
-        for j in range(len(mat[0])):
-            maxcol = mat[0][j]
-            for  i in range(1, len(mat)):
-                if mat[i][j] > maxcol: 
-                    maxcol = mat[i][j]
-            score *= maxcol
-        return score     
+        self.avaliacoes += 1
+        return self.estadoScore(s).scoreMult()
        
     # EXHAUSTIVE SEARCH
        
     def nextSol (self, s):
         nextS = [0]*len(s) #vai criar a lista s com o em toda ela lista que vai conter em que posição das seqs está a começar a formação dos motifs
         pos = len(s) - 1 #pos vai ser igual ao comprimento da lista s -1
-        while pos >=0 and s[pos] == self.seqSize(pos) - self.motifSize: #vê se as seqs já chegaram todas ao fim, se sim retorna none
+        while pos >=0 and s[pos] == self.ultimaPosicao(pos): #vê se as seqs já chegaram todas ao fim, se sim retorna none
             pos -= 1
         if (pos < 0): 
             nextS = None #quando NextS = None vamos ter a finalização e vamos ter como resulta
@@ -92,6 +578,35 @@ class MotifFinding:
             s = self.nextSol(s) #o próximo s vai ser o nexts
         return res #o resultado sao as posicoes iniciais que vao maximizar o score
      
+    def parallelExhaustiveSearch(self, processos=None, unidades=None):
+        """Procura exaustiva num conjunto de processos. O espaço é partido pelas posições das primeiras seqs em pelo
+        menos unidades prefixos (por omissão 8 por processo), percorridos por exaustivaPrefixo. Dá a mesma solução
+        que exhaustiveSearch: o maior score e, nos empates, a primeira solução por ordem lexicográfica."""
+        n = len(self.seqs)
+        limites = [self.ultimaPosicao(i) for i in range(n)]
+        if processos is None: processos = os.cpu_count() or 1
+        if unidades is None: unidades = 8 * processos
+        tarefas, total = prefixos(limites, unidades)
+        melhor = Value("i", -1)
+        args = (self.janelas(), limites, melhor)
+        if processos == 1:
+            iniciaProcura(*args)
+            resultados = map(exaustivaPrefixo, tarefas)
+        else:
+            pool = Pool(processos, iniciaProcura, args)
+            resultados = pool.imap(exaustivaPrefixo, tarefas, max(1, total // (4 * processos)))
+        melhorScore, res = -1, []
+        try:
+            for avaliacoes, r in resultados: #os prefixos chegam por ordem lexicográfica: num empate fica o primeiro
+                self.avaliacoes += avaliacoes
+                if r is not None and r[0] > melhorScore:
+                    melhorScore, res = r
+        finally:
+            if processos != 1:
+                pool.close()
+                pool.join()
+        return res
+     
     # BRANCH AND BOUND     
      
     def nextVertex (self, s):
@@ -102,7 +617,7 @@ class MotifFinding:
             res.append(0) #vai fazer com que a ultima seq comece novamente no 0 independentemente da posição das outras cadeias
         else: # bypass
             pos = len(s)-1 
-            while pos >=0 and s[pos] == self.seqSize(pos) - self.motifSize: #vai ver se a ultima seq já chegou ao fim e assim sucessivamente
+            while pos >=0 and s[pos] == self.ultimaPosicao(pos): #vai ver se a ultima seq já chegou ao fim e assim sucessivamente
                 pos -= 1
             if pos < 0: res = None #last solution #vai acabar o ciclo, implica que chegou a ultima hipotese
             else:
@@ -114,7 +629,7 @@ class MotifFinding:
     def bypass (self, s): #vai ver se já chegou as ultimas letras de seq, se chegou vai altera-las para 0 e vai acrescenta-las
         res =  []
         pos = len(s) -1
-        while pos >=0 and s[pos] == self.seqSize(pos) - self.motifSize:
+        while pos >=0 and s[pos] == self.ultimaPosicao(pos):
             pos -= 1
         if pos < 0: res = None 
         else:
@@ -122,23 +637,73 @@ class MotifFinding:
             res.append(s[pos]+1)
         return res
         
-    def branchAndBound (self):
-        melhorScore = -1
-        melhorMotif = None
-        size = len(self.seqs)
-        s = [0]*size #vai criar a mesma lista s
-        while s != None: #enquanto o s não for None ele vai sempre continuar
-            if len(s) < size: #quando o tamanho de s for menor que o tamanho da seq significa que uma das seqs já chegou ao fim
-                optimScore = self.score(s) + (size-len(s)) * self.motifSize
-                if optimScore < melhorScore: s = self.bypass(s) #avança o ramo poruqe não conseguimos melhor score do qeu no qeu há foi calculado antes
-                else: s = self.nextVertex(s)
-            else:
-                sc = self.score(s) #calcular o score dos motifs
-                if sc > melhorScore: #se o scor for maior que o mais maior vai alterar o melhor score e o melhorMotif
-                    melhorScore = sc
-                    melhorMotif  = s
-                s = self.nextVertex(s) #e vai fazer que o s seja o Nexts
-        return melhorMotif
+    def branchAndBound (self, processos=1, unidades=None):
+        """Branch and bound com o majorante por coluna de bbSubarvore. O melhor score começa no da heuristicConsensus.
+        Com processos != 1 a árvore é partida em subárvores (prefixos, por omissão 64 por processo) que os processos vão
+        tirando de uma fila à medida que ficam livres, partilhando o melhor score; o resultado é sempre o de
+        processos=1: o maior score e, nos empates, a primeira solução por ordem lexicográfica."""
+        n = len(self.seqs)
+        limites = [self.ultimaPosicao(i) for i in range(n)]
+        melhor = Value("i", self.score(self.heuristicConsensus()))
+        args = (self.janelas(), limites, melhor)
+        if processos == 1:
+            iniciaBB(*args)
+            resultados = [bbSubarvore(())]
+        else:
+            if processos is None: processos = os.cpu_count() or 1
+            tarefas, total = prefixos(limites, unidades or 64 * processos)
+            with Pool(processos, iniciaBB, args) as pool:
+                resultados = list(pool.imap_unordered(bbSubarvore, tarefas, max(1, total // (16 * processos))))
+        self.avaliacoes += sum(a for a, _ in resultados)
+        resultados = [r for _, r in resultados if r is not None]
+        return min(resultados, key=lambda r: (-r[0], r[1]))[1] if resultados else None
+
+    # Median string (procura pelos padrões)
+
+    def medianString(self):
+        """Procura a string mediana: o padrão de tamanho motifSize com a menor soma, pelas seqs, da distância de Hamming
+        à sua janela mais parecida. Os padrões são percorridos em profundidade letra a letra; a distância de um prefixo
+        às janelas cortadas ao mesmo tamanho nunca desce quando o prefixo cresce, por isso um prefixo que já não fica
+        abaixo da melhor distância é cortado. As distâncias usam o índice dos prefixos distintos das janelas de cada
+        seq, com as letras em bits (popcount do XOR). Devolve (mediana, distância total)."""
+        janelas = self.janelas()
+        nalf, size = len(self.alphabet), self.motifSize
+        indices = [janelas.indicePrefixos(i) for i in range(len(self.seqs))]
+        if any(not ind[size] for ind in indices):
+            raise ValueError("Há seqs sem nenhuma janela válida")
+        melhor = [2 * size * len(indices) + 1, 0] #distâncias em dobro, como dá o popcount
+        avaliacoes = [0] #prefixos de janelas comparados com um padrão
+
+        def desce(m, v):
+            for a in range(nalf):
+                w = (v << nalf) | (1 << a)
+                d = 0
+                for ind in indices:
+                    avaliacoes[0] += len(ind[m + 1])
+                    d += min(map(int.bit_count, map(w.__xor__, ind[m + 1])))
+                    if d >= melhor[0]: break
+                else:
+                    if m + 1 == size: melhor[0], melhor[1] = d, w
+                    else: desce(m + 1, w)
+
+        desce(0, 0)
+        self.avaliacoes += avaliacoes[0]
+        v = melhor[1]
+        letras = [self.alphabet[((v >> (nalf * (size - 1 - j))) & ((1 << nalf) - 1)).bit_length() - 1]
+                  for j in range(size)]
+        return "".join(letras), melhor[0] // 2
+
+    def medianStringSearch(self): #posições iniciais (a primeira janela mais próxima da mediana em cada seq)
+        mediana, _ = self.medianString()
+        janelas = self.janelas()
+        v = JanelasCodificadas([MySeq(mediana, self.seqs[0].tipo)], self.motifSize).umQuente(0)[0][1]
+        s = []
+        for i in range(len(self.seqs)):
+            pos = janelas.umQuente(i)
+            d = list(map(int.bit_count, map(v.__xor__, [x for _, x in pos])))
+            self.avaliacoes += len(d)
+            s.append(pos[d.index(min(d))][0])
+        return s
 
     # Consensus (heuristic)
   
@@ -146,49 +711,49 @@ class MotifFinding:
         """Procura as posiçoes para o motif nas duas primeiras sequências
         Pode foçar uma procura de motifs não ótima para o geral das seqs. Na seq 3 pode não ser o ideal e vai escolher
         a mais semelhante e assumir que são esses os motifs mas com mutações
+        As posições candidatas de cada seq são avaliadas todas de uma vez contra o perfil atual (ganhos)
         """
-        mf = MotifFinding(self.motifSize, self.seqs[:2]) #procura exaustiva das duas primeiras seqs
-        s =mf.exhaustiveSearch() #Exemplo: (1, 3) o 1 corresponde à primeira posicao do motif na seq1 e o 3 à 2º posicao na seq 2
+        janelas = self.janelas()
+        estado = self.estadoScore([])
+        self.avaliacoes += janelas.nJanelas[0] * (janelas.nJanelas[1] if len(self.seqs) > 1 else 1) \
+            + sum(janelas.nJanelas[2:]) #cada janela candidata posta contra o perfil
+        if len(self.seqs) < 2: #só uma seq: a janela com mais letras válidas
+            return [argmax(ganhos(estado, janelas.colunas(i))) for i in range(len(self.seqs))]
+        bestscore, s = -1, None
+        for p in range(janelas.nJanelas[0]): #procura exaustiva das duas primeiras seqs: para cada janela da seq 1 a melhor da seq 2
+            estado.muda(0, p)
+            g = ganhos(estado, janelas.colunas(1))
+            q = argmax(g)
+            if q >= 0 and estado.total + g[q] > bestscore:
+                bestscore, s = estado.total + g[q], [p, q]
+        estado.define(s)
         for i in range(2, len(self.seqs)): #Avalia a melhor posição para cada uma das outras sequências, guardando-a (maximiza o score)
-            s.append(0) #vai para a seq 3 qeu vai começar no 0 e vai correr até encontrar o motif em causa
-            bestscore = -1
-            bestPosition = 0
-            for j in range(self.seqSize(i) - self.motifSize + 1):
-                s[i] = j
-                scoreatual = self.score(s)
-                if scoreatual > bestscore:
-                    bestscore = scoreatual
-                    bestPosition = j
-                s[i] = bestPosition
+            s.append(argmax(ganhos(estado, janelas.colunas(i))))
+            estado.muda(i, s[i])
         return s
 
     # Consensus (heuristic)
 
     def heuristicStochastic (self):
-        from random import randint
-        s = [0] * len(self.seqs) #gera um vetor aleatório com o mesmo tamanho do nº de seqs qeu existem
-        #passo 1: indica todas as posições com valores aleatórios
-        for i in range(len(self.seqs)):
-            s[i] = randint (0, self.seqSize(i) - self.motifSize) #como é random pode escolher um otimo local mas não a solução otima
-        #passo 2
-        best_score = self.score(s)
-        improve = True
-        while improve :
-            #constroi o perfil com base nas posições iniciais s
-            motif = self.createMotifFromIndexes(s)
-            motif.createPWM() #vai criar a matriz PWM
-            #passo 3
-            for i in range(len(self.seqs)): #avalia a melhor posicao inicial para cada seq
-                s[i] = motif.mostProbableSeq(self.seqs[i]) #vai ver em cada seq de self.seqs, qual é a subseq nelas que é mais provável de acontecer no quandro PWM
-            #passo 4
-            #verifica se houve melhoria
-            scr = self.score(s) #vai calcular o score
-            if scr < best_score: #se o score melhorou volta a repetir o processo se não acaba e devolve as melhores posições das subseqs
-                best_score = scr
-            else:
-                improve = False
+        """Parte de posições aleatórias e repete perfil -> janela mais provável de cada seq enquanto o score melhorar
+        (subidaEstocastica); usa o gerador do módulo random"""
+        _, s, avaliacoes = subidaEstocastica(self.janelas(), self.estadoScore(), random)
+        self.avaliacoes += avaliacoes
         return s
 
+    def parallelHeuristicStochastic(self, reinicios=64, processos=None, semente=0):
+        """Corre a heuristicStochastic a partir de reinicios posições aleatórias (sementes semente, semente+1, ...) num
+        conjunto de processos e devolve as posições do melhor score (nos empates, a do primeiro reinício)"""
+        sementes = range(semente, semente + reinicios)
+        if processos == 1:
+            iniciaJanelas(self.janelas())
+            resultados = list(map(estocasticaTrabalho, sementes))
+        else:
+            with Pool(processos, iniciaJanelas, (self.janelas(),)) as pool:
+                resultados = pool.map(estocasticaTrabalho, sementes)
+        self.avaliacoes += sum(r[2] for r in resultados)
+        return max(enumerate(resultados), key=lambda r: (r[1][0], -r[0]))[1][1]
+
     # Gibbs sampling 
 
     def gibbs (self, iterations = 100):
@@ -197,29 +762,77 @@ class MotifFinding:
         s = [] #cria a lsiat s de posições iniciais
         # passo 1: indica todas as posições com valores aleatórios(vetor inicializado de forma aleatória)
         for i in range(len(self.seqs)):
-            s.append(randint(0, len(self.seqSize[i]) - self.motifSize - 1)) #escolher um numero random de start para cada sequência
+            s.append(randint(0, self.ultimaPosicao(i))) #escolher um numero random de start para cada sequência
         best_score = self.score(s) #calcular o score de s
         best = list(s)
         for it in range(iterations):
             #passo 2: esolher uma das seqs aleatoriamente
             seq_idx = randint(0, len(self.seqs) -1) #retira uma seq aleatória
             #passo 3: cria o perfil sem a seq escolhida aleatoriamente
-            seq = self.seqs[seq_idx] #indicar qual a seq que vai remover
-            s.pop(seq_idx)  # vai remover a posição inicial correspondente a seq escolhida para ser removida
-            removed = self.seqs.pop(seq_idx)  # vai dar pop da seq na lista e guardar no removed
-            motif = self.createMotifFromIndexes(s)  # Criar o perfil sem a sequência removida
-            motif.createPWM()
-            self.seqs.insert(seq_idx,removed)  # vai voltar a adicionar a seq removida a lista de seqs na posição seq_idx
-            r = motif.probAllPositions(seq)  # vai calcular a probabilidade de todas as subseqs possiveis na seq removida
+            estado = self.estadoScore(s)
+            estado.muda(seq_idx, None)  # vai tirar a janela da seq escolhida do perfil
+            pwm = estado.pwm()  # Criar o perfil sem a sequência removida
+            r = self.janelas().probabilidades(seq_idx, pwm)  # vai calcular a probabilidade de todas as subseqs possiveis na seq removida
+            self.avaliacoes += len(r)
             pos = self.roulette(r)  # vai fazer o roulette da lista e escolher um dos valores com valores maior que 0, devolvendo a posição onde se iniciou o motif
-            s.insert(seq_idx, pos)#vai adicionar o valor da pos do motif ao s na posição seq_idx
+            s[seq_idx] = pos #vai pôr o valor da pos do motif no s na posição seq_idx
             scr = self.score(s) #calcula o novo score
             #verifica se houve melhoria
-            if scr < best_score:
+            if scr > best_score:
                 best_score = scr
                 best = list(s)
-            else:
-                improve = False
+        return best
+
+    def parallelGibbs(self, cadeias=8, iteracoes=1000, processos=None, semente=0, pseudo=1.0, temperatura=1.0,
+                      paciencia=None, reinicios=0):
+        """Corre cadeias cadeias de Gibbs sampling (cadeiaGibbs) num conjunto de processos, a cadeia c com a semente
+        semente + c, e devolve as posições do melhor score de todas (nos empates, a da primeira cadeia).
+        temperatura > 1 faz annealing; paciencia (por omissão iteracoes // 5) é o nº de iterações sem melhorar para
+        uma cadeia recomeçar (até reinicios vezes) ou acabar."""
+        if paciencia is None: paciencia = max(iteracoes // 5, 1)
+        janelas = self.janelas()
+        args = (janelas, composicaoFundo(janelas))
+        tarefas = [(semente + c, iteracoes, pseudo, temperatura, paciencia, reinicios) for c in range(cadeias)]
+        if processos == 1:
+            iniciaGibbs(*args)
+            resultados = list(map(cadeiaGibbs, tarefas))
+        else:
+            with Pool(processos, iniciaGibbs, args) as pool:
+                resultados = pool.map(cadeiaGibbs, tarefas)
+        self.avaliacoes += sum(r[2] for r in resultados)
+        melhor = max(range(cadeias), key=lambda c: (resultados[c][0], -c))
+        return resultados[melhor][1]
+
+    # Expectation-Maximization
+
+    def em(self, modelo="oops", inicios=16, iteracoes=100, processos=None, semente=0, pseudo=0.1, tol=1e-6):
+        """Motif por EM (correEM) a partir de inicios janelas sorteadas (com a semente), corridos num conjunto de
+        processos; fica o ponto de partida com a maior log verosimilhança (nos empates, o primeiro). Devolve as
+        posições mais prováveis do motif em cada seq; no modelo "zoops" é None nas seqs em que a probabilidade de ter
+        o motif é menor do que 0.5."""
+        if modelo not in ("oops", "zoops"):
+            raise ValueError("Modelo desconhecido: " + str(modelo))
+        janelas = self.janelas()
+        rnd = random.Random(semente)
+        validas = [i for i, nj in enumerate(janelas.nJanelas) if nj > 0]
+        pontos = []
+        for _ in range(inicios):
+            i = rnd.choice(validas)
+            pontos.append((i, rnd.randrange(janelas.nJanelas[i])))
+        tarefas = [(pt, modelo, iteracoes, pseudo, tol) for pt in pontos]
+        args = (janelas, composicaoFundo(janelas))
+        if processos == 1:
+            iniciaGibbs(*args)
+            resultados = list(map(emTrabalho, tarefas))
+        else:
+            with Pool(processos, iniciaGibbs, args) as pool:
+                resultados = pool.map(emTrabalho, tarefas)
+        self.avaliacoes += sum(r[4] for r in resultados)
+        _, _, Z, _, _ = max(enumerate(resultados), key=lambda r: (r[1][0], -r[0]))[1]
+        s = []
+        for z in Z:
+            if not z or (modelo == "zoops" and sum(z) < 0.5): s.append(None)
+            else: s.append(argmax(z))
         return s
 
     def roulette(self, f): #o f é a lista com as probabilidades de ocorrer o motif
@@ -238,67 +851,35 @@ class MotifFinding:
 #EX com pseudo contagens
 
     def scoreEX(self, m): #responsável por calcular a contagem com as pseudo contagens
-            score = 0
-            motif = self.createMotifFromIndexes(m)
-            motif.doCounts() #cria a matriz de contagens
-            mat = [] #lista vazia qeu vai servir como matriz depois
-            for i in range(len(motif.counts)): #vai correr as linhas da matriz com as counts
-                linha = []
-                for j in range(len(motif.counts[i])):
-                    linha.append(motif.counts[i][j] + 1) #não permite que haja 0 possibilitando as pseudo contagens
-                mat.append(linha)
-            for k in range(len(mat[0])): #vai correr as colunas da matriz
-                maxcol = mat[0][k] #vai dizer que o maxcolun vai ser igual ao primeiro elemento da coluna
-                for f in range(1, len(mat)): #vai começar no segundo elemento da coluna e vai comparar com todos os elementos da coluna para ver qual é o maior
-                    if mat[f][k] > maxcol:
-                        maxcol = mat[f][k]
-                score += maxcol #vai adionar esse valor a coluna
-            return score #vai dar o score da consenso
+        self.avaliacoes += 1
+        return self.estadoScore(m).total + self.motifSize #com +1 em todas as contagens cada máximo de coluna sobe 1
 
     def probabSeqEX (self, seq, pwm): #vai calcular a probabilidade de a seq fazer parte deste quadro sendo que todos os elementos do quadro nao tem valores negativos
-        res = 1.0
-        for i in range(self.motifSize):
-            lin = self.alphabet.index(seq[i])
-            res *= pwm[lin][i] #damos a pwm e nao usamso o self.pwm por causa de termos substituido os 0
-        return res #da a probabilidade de cada seq ocorrer
+        return self.probAllPositionsEX(seq[:self.motifSize], pwm)[0] #damos a pwm e nao usamso o self.pwm por causa de termos substituido os 0
 
     def mostProbableSeqEX(self, seq, pwm): #vai ver qual a posição inicial da subseq de uma seq de comprimento indefenido encaixa melhor no quandro de motifs das seqs
-        maximo = -1.0
-        maxind = -1
-        for k in range(len(seq)-self.motifSize):
-            p = self.probabSeqEX(seq[k:k+ self.motifSize], pwm)
-            if(p > maximo):
-                maximo = p
-                maxind = k
-        return maxind
+        return argmax(self.probAllPositionsEX(seq, pwm))
 
     def probAllPositionsEX(self, seq, pwm): #este em vez de calcular a probabilidade de acontecer devolve uma lista com as probabilidades de acontecer em cada letra da seq
-        res = []
-        for k in range(len(seq)-self.motifSize+1):
-            res.append(self.probabSeqEX(seq, pwm))
-        return res
+        return varreJanelas(codigosSeq(seq, self.alphabet), tabelasColunas(pwm, 0.0), mul)
 
     def heuristicStochastic_EX(self):
         from random import randint
         s = [0] * len(self.seqs) #gera um vetor aleatório com o mesmo tamanho do nº de seqs qeu existem
         #passo 1
         for i in range(len(self.seqs)): #indica todas as posições com valores aleatórios
-            s[i] = randint(0, self.seqSize(i) - self.motifSize) #como é random pode escolher um otimo local mas não a solução otima
+            s[i] = randint(0, self.ultimaPosicao(i)) #como é random pode escolher um otimo local mas não a solução otima
         #Passo 2
         melhorscore = self.scoreEX(s) #vai fazer o score consoante o novo score2 que não vai conter valores 0 já com as pseudos contagens
         improve = True
         while improve:
-            motif = self.createMotifFromIndexes(s) #constroi o perfil com base nas posições iniciais s
-            motif.createPWM() #vai criar a matriz PWM
-            newPWM = [] #vai construir a matriz PWM sem nenhum numero negativo já com as pseudo contagens
-            for k in range(len(motif.pwm)):
-                linhas = []
-                for t in range(len(motif.pwm[0])):
-                    linhas.append(motif.pwm[k][t] + 0.1) #quando ao probabilidade seri a0 passa a ser 0.1
-                newPWM.append(linhas)
+            estado = self.estadoScore(s) #constroi o perfil com base nas posições iniciais s
+            newPWM = estado.pwm(0.1 * estado.n) #vai construir a matriz PWM já com as pseudo contagens: quando a probabilidade seria 0 passa a ser 0.1
             #Passo 3
+            janelas = self.janelas()
             for i in range(len(self.seqs)): #avalia a melhor posicao inicial para cada seq
-                s[i] = self.mostProbableSeqEX(self.seqs[i], newPWM) #vai ver em cada seq de self.seqs, qual é a subseq nelas que é mais provável de acontecer no quandro PWM
+                s[i] = argmax(janelas.probabilidades(i, newPWM)) #vai ver em cada seq de self.seqs, qual é a subseq nelas que é mais provável de acontecer no quandro PWM
+                self.avaliacoes += janelas.nJanelas[i]
             # passo 4
             # verifica se houve melhoria
             scr = self.scoreEX(s) #vai calcular o score
@@ -314,28 +895,20 @@ class MotifFinding:
         s = [] #cria a lsiat s de posições iniciais
         # passo 1 indica todas as posições com valores aleatórios(vetor inicializado de forma aleatória)
         for i in range(len(self.seqs)):
-             s.append(randint(0, len(self.seqs[i]) - self.motifSize -1)) #escolher um numero random de start para cada sequência
+             s.append(randint(0, self.ultimaPosicao(i))) #escolher um numero random de start para cada sequência
         melhorscore = self.scoreEX(s) #calcular o score de s
         bests = list(s)
         for it in range(iterations):
             # passo 2: esolher uma das seqs aleatoriamente
             seq_idx = randint(0, len(self.seqs) - 1) #retira uma seq aleatória
             # passo 3: cria o perfil sem a seq escolhida aleatoriamente
-            seq = self.seqs[seq_idx]
-            s.pop(seq_idx)
-            removed = self.seqs.pop(seq_idx) #vai dar pop da seq na lista e guardar no removed
-            motif = self.createMotifFromIndexes(s) #Cria o perfil sem a sequência removida
-            motif.createPWM()
-            newPWM = [] #vai contruir a matriz PWM sem nenhum numero negativo já com as pseudo contagens
-            for k in range(len(motif.pwm)):
-                linhas = []
-                for t in range(len(motif.pwm[0])):
-                    linhas.append(motif.pwm[k][t] + 0.1) #substitiu as probabilidade de 0 por 0.1
-                newPWM.append(linhas)
-            self.seqs.insert(seq_idx, removed) #vai voltar a adicionar a seq removida a lista de seqs na posição seq_idx
-            r = self.probAllPositionsEX(seq, newPWM) #vai calcular a probabilidade de todas as subseqs possiveis na seq removida
+            estado = self.estadoScore(s)
+            estado.muda(seq_idx, None) #tira a janela da seq escolhida do perfil
+            newPWM = estado.pwm(0.1 * estado.n) #vai contruir a matriz PWM sem a seq e já com as pseudo contagens (substitiu as probabilidade de 0 por 0.1)
+            r = self.janelas().probabilidades(seq_idx, newPWM) #vai calcular a probabilidade de todas as subseqs possiveis na seq removida
+            self.avaliacoes += len(r)
             pos = self.roulette(r) #vai fazer o roulette da lista e escolher um dos valores com valores maior que 0, devolvendo a posição onde se iniciou o motif
-            s.insert(seq_idx, pos) #vai adicionar o valor da pos do motif ao s na posição seq_idx
+            s[seq_idx] = pos #vai pôr o valor da pos do motif no s na posição seq_idx
             score = self.scoreEX(s) #vai calcular o score do novo s
             if score > melhorscore: #vai ver se este é maior que o melhor scor se for, o melhorscore passa a ser o score e a bests passa a ser a s
                 melhorscore = score
@@ -363,6 +936,7 @@ def test2():
     print ("Solution", sol)
     print ("Score: ", mf.score(sol))
     print("Consensus:", mf.createMotifFromIndexes(sol).consensus())
+    print ("Parallel exhaustive:", mf.parallelExhaustiveSearch(2))
 
     print ("Branch and Bound:")
     sol2 = mf.branchAndBound()
@@ -370,6 +944,8 @@ def test2():
     print ("Score:" , mf.score(sol2))
     print("Consensus:", mf.createMotifFromIndexes(sol2).consensus())
     
+    print ("Median string:", mf.medianString(), mf.medianStringSearch())
+
     print ("Heuristic consensus: ")
     sol1 = mf.heuristicConsensus()
     print ("Solution: " , sol1)
@@ -390,6 +966,7 @@ def test4():
     print("Heuristic stochastic")
     sol = mf.heuristicStochastic()
     print ("Solution: " , sol)
+    print ("Restarts:", mf.score(mf.parallelHeuristicStochastic(64)))
     print ("Score:" , mf.score(sol))
     print ("Score mult:" , mf.scoreMult(sol))
     print("Consensus:", mf.createMotifFromIndexes(sol).consensus())
@@ -398,6 +975,12 @@ def test4():
     print ("Score:" , mf.score(sol2))
     print ("Score mult:" , mf.scoreMult(sol2))
 
+    sol3 = mf.parallelGibbs(cadeias=8, iteracoes=500, temperatura=4.0, reinicios=2)
+    print ("Parallel Gibbs:", sol3, mf.score(sol3))
+
+    sol4 = mf.em(inicios=8)
+    print ("EM:", sol4, mf.score(sol4))
+
 def testEX():
     mf = MotifFinding()
     mf.readFile("exemploMotifs.txt","dna")
@@ -409,5 +992,6 @@ def testEX():
     sol2 = mf.gibbsEX()
     print ("Score:" , mf.scoreEX(sol2))
 
-print('-------------------')
-testEX()
\ No newline at end of file
+if __name__ == "__main__":
+    print('-------------------')
+    testEX()
\ No newline at end of file
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import math
+from bisect import bisect_left
+from itertools import accumulate, compress, repeat
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from operator import add, mul, neg
+
+from MyMotifs import codigosSeq, tabelasColunas, varreJanelas
+
+# Os scores log-odds de cada motif são passados a inteiros (em 1/resolucao bits). Com scores inteiros a distribuição
+# exata do score de uma janela aleatória (bases tiradas do modelo de fundo) calcula-se por programação dinâmica
+# coluna a coluna, e daí sai o p-valor de qualquer score: P(score >= s).
+
+RESOLUCAO = 100
+INVALIDA = -(1 << 40) #score de uma base inválida: a janela fica sempre abaixo do limiar
+
+
+def distribuicaoScores(pssmInt, fundo):
+    """Distribuição exata do score inteiro de uma janela de bases independentes com probabilidades fundo.
+    Devolve (mínimo, probs) com probs[i] = P(score == mínimo + i). Cada coluna soma à distribuição atual uma cópia
+    deslocada por letra (slices e map), sem ciclo em python por valor. As letras com score INVALIDA (-inf na PSSM)
+    ficam de fora: essas janelas nunca chegam a nenhum limiar, por isso a sua probabilidade não entra nas caudas."""
+    minimo = 0
+    dist = [1.0]
+    for j in range(len(pssmInt[0])):
+        letras = [a for a in range(len(fundo)) if fundo[a] > 0 and pssmInt[a][j] != INVALIDA]
+        if not letras: return 0, [] #nenhuma janela tem score finito
+        col = [pssmInt[a][j] for a in letras]
+        lo = min(col)
+        nova = [0.0] * (len(dist) + max(col) - lo)
+        for a, x in zip(letras, col):
+            o = x - lo
+            nova[o:o + len(dist)] = map(add, nova[o:o + len(dist)], map(mul, dist, repeat(fundo[a])))
+        dist = nova
+        minimo += lo
+    return minimo, dist
+
+def caudaScores(dist): #cauda[i] = P(score >= mínimo + i)
+    return list(accumulate(reversed(dist)))[::-1] or [0.0]
+
+def pssmCompInverso(pssm): #matriz do motif na cadeia complementar (A<->T, C<->G, colunas pela ordem inversa)
+    n = len(pssm)
+    return [linha[::-1] for linha in reversed(pssm)] if n == 4 else None
+
+
+class MotivoCompilado:
+    """PSSM inteira de um MyMotifs pronta a varrer: tabelas por coluna das duas cadeias e, para cada cadeia, a
+    distribuição dos scores e o limiar inteiro correspondente ao p-valor pedido. A matriz da cadeia inversa tem outra
+    distribuição quando o fundo não é simétrico (A != T ou C != G), por isso cada cadeia tem a sua."""
+
+    def __init__(self, motivo, nome, pvalor=1e-4, resolucao=RESOLUCAO):
+        if motivo.pssm is None: motivo.createPSSM()
+        self.nome = nome
+        self.size = motivo.size
+        self.alphabet = motivo.alphabet
+        self.resolucao = resolucao
+        self.pssmInt = [[round(x * resolucao) if x != -math.inf else INVALIDA for x in linha] for linha in motivo.pssm]
+        self.distribuicoes = {} #cadeia -> (mínimo, cauda)
+        self.limiares = {} #cadeia -> limiar inteiro
+        self.tabelas = {} #cadeia -> tabelas por coluna
+        inv = pssmCompInverso(self.pssmInt) if self.alphabet in ("ACGT", "ACGU") else None
+        for cadeia, mat in (("+", self.pssmInt), ("-", inv)):
+            if mat is None: continue
+            minimo, dist = distribuicaoScores(mat, motivo.fundo)
+            self.distribuicoes[cadeia] = (minimo, caudaScores(dist))
+            self.limiares[cadeia] = self.limiarPvalor(pvalor, cadeia)
+            self.tabelas[cadeia] = tabelasColunas(mat, INVALIDA)
+        self.minimo, self.cauda = self.distribuicoes["+"]
+        self.limiar = self.limiares["+"]
+        self.tabDir = self.tabelas["+"]
+        self.tabInv = self.tabelas.get("-")
+
+    def pvalor(self, scoreInt, cadeia="+"):
+        minimo, cauda = self.distribuicoes[cadeia]
+        i = scoreInt - minimo
+        if i <= 0: return cauda[0]
+        return cauda[i] if i < len(cauda) else 0.0
+
+    def limiarPvalor(self, p, cadeia="+"): #menor score inteiro com P(score >= limiar) <= p
+        minimo, cauda = self.distribuicoes[cadeia]
+        return minimo + bisect_left(cauda, -p, key=neg)
+
+
+# Trabalho de cada processo: as seqs codificadas estão todas seguidas num só buffer (memória partilhada) e cada
+# tarefa é um pedaço (seq, início, fim) de uma seq; só se reportam as janelas que começam em [início, fim).
+
+PARTILHADO = {}
+
+def iniciaScanner(buf, motivos, nomes, offsets):
+    if isinstance(buf, str): #nome do bloco de memória partilhada
+        shm = SharedMemory(name=buf)
+        PARTILHADO["shm"] = shm #tem de ficar referenciado enquanto o processo usar o buffer
+        buf = shm.buf
+    PARTILHADO["buf"] = memoryview(buf)
+    PARTILHADO["motivos"] = motivos
+    PARTILHADO["nomes"] = nomes
+    PARTILHADO["offsets"] = offsets
+
+def scanTrabalho(tarefa):
+    s, ini, fim = tarefa
+    buf, offsets = PARTILHADO["buf"], PARTILHADO["offsets"]
+    base, n = offsets[s], offsets[s + 1] - offsets[s]
+    nome = PARTILHADO["nomes"][s]
+    res = []
+    for m in PARTILHADO["motivos"]:
+        cods = buf[base + ini:base + min(fim + m.size - 1, n)]
+        for strand, tabs in m.tabelas.items():
+            limiar = m.limiares[strand]
+            scores = varreJanelas(cods, tabs, add)
+            for i, x in compress(enumerate(scores), map(limiar.__le__, scores)):
+                res.append((m.nome, nome, ini + i, strand, x / m.resolucao, m.pvalor(x, strand)))
+    return res
+
+
+class MotifScanner:
+    """Varre uma biblioteca de motifs (MyMotifs, numa lista ou num {nome: motif}) sobre uma coleção de seqs, nas duas
+    cadeias se o alfabeto for de DNA/RNA, dando os hits com p-valor <= pvalor"""
+
+    def __init__(self, motivos, pvalor=1e-4, resolucao=RESOLUCAO):
+        if not isinstance(motivos, dict):
+            motivos = {str(i): m for i, m in enumerate(motivos)}
+        self.motivos = [MotivoCompilado(m, nome, pvalor, resolucao) for nome, m in motivos.items()]
+        alfs = {m.alphabet for m in self.motivos}
+        if len(alfs) > 1:
+            raise ValueError("Os motifs têm alfabetos diferentes")
+        self.alphabet = alfs.pop() if alfs else "ACGT"
+
+    def codifica(self, seqs): #(buffer com todas as seqs codificadas, nomes, offsets)
+        partes, nomes, offsets = [], [], [0]
+        for i, s in enumerate(seqs):
+            partes.append(codigosSeq(s, self.alphabet))
+            nomes.append(getattr(s, "nome", None) or str(i))
+            offsets.append(offsets[-1] + len(partes[-1]))
+        return b"".join(partes), nomes, offsets
+
+    def tarefas(self, offsets, tamanho):
+        for s in range(len(offsets) - 1):
+            n = offsets[s + 1] - offsets[s]
+            for ini in range(0, n, tamanho):
+                yield s, ini, min(ini + tamanho, n)
+
+    def scan(self, seqs, processos=None, tamanho=1 << 20, ordenado=False):
+        """Gerador dos hits (motif, seq, posição, cadeia, score em bits, p-valor); a posição é sempre o início da
+        janela na cadeia direta. As seqs são codificadas uma vez para um bloco de memória partilhada que os processos
+        leem sem cópias; cada processo recebe os motifs compilados uma só vez (initializer) e devolve os hits de cada
+        pedaço de ~tamanho bases assim que o acaba. Com processos=1 corre tudo neste processo."""
+        buf, nomes, offsets = self.codifica(seqs)
+        tarefas = self.tarefas(offsets, tamanho)
+        if processos == 1:
+            iniciaScanner(buf, self.motivos, nomes, offsets)
+            for t in tarefas:
+                yield from scanTrabalho(t)
+            return
+        shm = SharedMemory(create=True, size=max(len(buf), 1))
+        try:
+            shm.buf[:len(buf)] = buf
+            del buf
+            with Pool(processos, iniciaScanner, (shm.name, self.motivos, nomes, offsets)) as pool:
+                mapa = pool.imap if ordenado else pool.imap_unordered
+                for hits in mapa(scanTrabalho, tarefas, 4):
+                    yield from hits
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+def test():
+    from MySeq import MySeq
+    from MyMotifs import MyMotifs
+    from random import Random
+    r = Random(2)
+    m1 = MyMotifs([MySeq(x) for x in ["TATAAA", "TATAAT", "TATATA", "TATAAA"]])
+    m2 = MyMotifs([MySeq(x) for x in ["GGGCGG", "GGGCGG", "GAGCGG"]])
+    seqs = []
+    for i in range(20):
+        s = "".join(r.choice("ACGT") for _ in range(2000))
+        seqs.append(MySeq(s[:500] + "TATAAA" + s[506:1500] + "CCGCCC" + s[1506:], nome=f"s{i}"))
+    scanner = MotifScanner({"TATA": m1, "GC": m2}, pvalor=1e-3)
+    for m in scanner.motivos:
+        print(m.nome, m.limiar, m.pvalor(m.limiar))
+    hits = list(scanner.scan(seqs, processos=2, tamanho=700, ordenado=True))
+    print(len(hits), hits[:3])
+
+    #fundo assimétrico (muito A, pouco T): a cadeia inversa tem outra distribuição, que tem de bater com a enumeração
+    from itertools import product
+    m3 = MyMotifs([MySeq(x) for x in ["AATC", "ATTC", "AAGC"]])
+    fundo = [0.5, 0.2, 0.2, 0.1]
+    m3.createPSSM(pseudo=0.5, fundo=fundo)
+    c = MotivoCompilado(m3, "assim", pvalor=0.05)
+    for cadeia, mat in (("+", c.pssmInt), ("-", pssmCompInverso(c.pssmInt))):
+        exata = {}
+        for js in product(range(4), repeat=c.size):
+            x = sum(mat[a][j] for j, a in enumerate(js))
+            exata[x] = exata.get(x, 0.0) + math.prod(fundo[a] for a in js)
+        for x in exata:
+            assert abs(c.pvalor(x, cadeia) - sum(p for y, p in exata.items() if y >= x)) < 1e-9
+    print(c.limiares)
+
+if __name__ == "__main__":
+    test()
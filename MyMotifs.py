@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import math
+from operator import add, mul
+
+from MySeq import tabelaCodificacao
+
 def createMatZeros (nl, nc): #função que vai cirar uma matriz de 0, com o temanho de nl * nc dependendo dos valores dados nestas variáveis
     res = [ ] 
     for i in range(0, nl):
@@ -9,81 +14,146 @@ def createMatZeros (nl, nc): #função que vai cirar uma matriz de 0, com o tema
 def printMat(mat): #função responsável por dar print a matriz, neste caso vai dar print lista a lista dentro da matriz
     for i in range(0, len(mat)): print(mat[i])
 
+def contagensCodigos(cods, size, nalf):
+    """Matriz de contagens (nalf x size) a partir de bytes com as janelas codificadas (MySeq.codifica) umas a seguir às
+    outras, ou seja uma matriz nseqs x size achatada: a coluna j é a fatia cods[j::size] e cada contagem é um count.
+    Uma letra fora do alfabeto dá ValueError, como o alphabet.index de antes."""
+    if cods and max(cods) >= nalf:
+        i = next(i for i, c in enumerate(cods) if c >= nalf)
+        raise ValueError(f"Letra fora do alfabeto na seq {i // size}, posição {i % size}")
+    colunas = [cods[j::size] for j in range(size)]
+    return [[col.count(a) for col in colunas] for a in range(nalf)]
+
+def argmaxColunas(mat): #para cada coluna, (índice da linha com o maior valor (o primeiro, se houver empates), valor)
+    res = []
+    for col in zip(*mat):
+        i = max(range(len(col)), key=col.__getitem__)
+        res.append((i, col[i]))
+    return res
+
+def codigosSeq(seq, alf): #bytes com o índice de cada letra de seq (str ou MySeq) em alf; letras fora de alf -> INVALIDO
+    if not isinstance(seq, str): seq = seq.seq
+    return seq.encode("ascii", "replace").translate(tabelaCodificacao(alf))
+
+def tabelasColunas(mat, vazio):
+    """Uma tabela de 256 posições por coluna de mat (nalf x size): na posição a está mat[a][j] e nas restantes (letras
+    inválidas) o valor vazio. Assim o valor de uma base numa coluna é só tabela[código]."""
+    res = []
+    for j in range(len(mat[0])):
+        tab = [vazio] * 256
+        for a in range(len(mat)):
+            tab[a] = mat[a][j]
+        res.append(tab)
+    return res
+
+def varreJanelas(cods, tabelas, op=add):
+    """Valores de todas as janelas de cods (uma por posição inicial) de uma só vez: para cada coluna j vai buscar às
+    tabelas os valores de cods[j:j+nj] (com map, sem ciclo em python por base) e junta-os aos acumulados com op
+    (add para log-odds, mul para probabilidades)"""
+    size = len(tabelas)
+    nj = len(cods) - size + 1
+    if nj <= 0: return []
+    return varreColunas([cods[j:j + nj] for j in range(size)], tabelas, op)
+
+def varreColunas(colunas, tabelas, op=add):
+    """O mesmo que varreJanelas com as colunas das janelas já separadas: colunas[j][p] é a letra j da janela p"""
+    res = list(map(tabelas[0].__getitem__, colunas[0]))
+    for j in range(1, len(tabelas)):
+        res = list(map(op, res, map(tabelas[j].__getitem__, colunas[j])))
+    return res
+
+def logOdds(p, q): #log2(p / q), com -inf quando p = 0 ou a letra não existe no fundo (q = 0)
+    return math.log2(p / q) if p > 0 and q > 0 else -math.inf
+
+def argmax(v): #posição do maior valor (a primeira, se houver empates); -1 se v for vazio
+    return max(range(len(v)), key=v.__getitem__) if v else -1
+
 class MyMotifs:
 
-    def __init__(self, seqs): #calsse recebe sempre uma lista de seq
-        self.size = len(seqs[0]) #comprimentos de caractares das seq
-        self.seqs = seqs# objetos classe MySeq/ vai ser a nossa lista de seqs
-        self.alphabet = seqs[0].alfabeto() #vai a classe myseq chamar a função alfabeto, para dar return de um tipo de alfabeto
-        self.doCounts() #criar a matriz de contagens das letras entre as seqs
-        self.createPWM() #criar a matriz de PWM, que é a matriz de probabilidades
+    def __init__(self, seqs=None, pwm=None, alphabet=None): #calsse recebe sempre uma lista de seq (ou uma PWM e o alfabeto)
+        if seqs is not None:
+            self.size = len(seqs[0]) #comprimentos de caractares das seq
+            self.seqs = seqs# objetos classe MySeq/ vai ser a nossa lista de seqs
+            self.alphabet = seqs[0].alfabeto() #vai a classe myseq chamar a função alfabeto, para dar return de um tipo de alfabeto
+            self.cods = b"".join(s.codifica() for s in seqs) #matriz nseqs x size achatada com os índices das letras
+            self.doCounts() #criar a matriz de contagens das letras entre as seqs
+            self.createPWM() #criar a matriz de PWM, que é a matriz de probabilidades
+        else: #motif dado diretamente pela PWM (por exemplo nos algoritmos evolutivos)
+            self.pwm = pwm
+            self.size = len(pwm[0])
+            self.alphabet = alphabet
+            self.seqs = None
+            self.counts = None
+            self.tabPWM = tabelasColunas(pwm, 0.0)
+        self.pssm = None
         
     def __len__ (self): #return do comprimento das seqs
         return self.size        
         
-    def doCounts(self): #cria as matrizes de contagens
-        self.counts = createMatZeros(len(self.alphabet), self.size)
-        for s in self.seqs:
-            for i in range(self.size):
-                lin = self.alphabet.index(s[i])
-                self.counts[lin][i] += 1
+    def doCounts(self): #cria as matrizes de contagens, coluna a coluna sobre as janelas codificadas
+        if self.seqs is None:
+            raise ValueError("Motif criado só com a PWM: não há seqs para contar")
+        self.counts = contagensCodigos(self.cods, self.size, len(self.alphabet))
                 
     def createPWM(self): #cria a mtriz de probabilidades
-        if self.counts == None: self.doCounts()
-        self.pwm = createMatZeros(len(self.alphabet), self.size)
-        for i in range(len(self.alphabet)):
-            for j in range(self.size):
-                self.pwm[i][j] = float(self.counts[i][j]) / len(self.seqs)
+        if self.counts is None: self.doCounts()
+        n = len(self.seqs)
+        self.pwm = [[float(x) / n for x in linha] for linha in self.counts]
+        self.tabPWM = tabelasColunas(self.pwm, 0.0) #probabilidade 0 para letras inválidas
+
+    def createPSSM(self, pseudo=1.0, fundo=None):
+        """Matriz log-odds (log2) contra um modelo de fundo (lista de probabilidades pela ordem do alfabeto, uniforme se
+        não for dado). A probabilidade da letra a na coluna j é (contagem + pseudo*fundo[a]) / (nseqs + pseudo); se o
+        motif só tiver PWM, esta conta como contagens de uma seq. Com pseudo=0 uma letra que nunca aparece numa coluna
+        fica com -inf (a janela nunca é hit)."""
+        nalf = len(self.alphabet)
+        if fundo is None: fundo = [1.0 / nalf] * nalf
+        if self.counts is not None:
+            freqs, n = self.counts, len(self.seqs)
+        else:
+            freqs, n = self.pwm, 1.0
+        self.fundo = fundo
+        self.pssm = [[logOdds((freqs[a][j] + pseudo * fundo[a]) / (n + pseudo), fundo[a]) for j in range(self.size)]
+                     for a in range(nalf)]
+        self.tabPSSM = tabelasColunas(self.pssm, -math.inf) #janelas com letras inválidas nunca são hits
+        return self.pssm
                 
-    def consensus(self): #vai procurar o consensus na matriz dos counts por coluna
-        res = ""
-        for j in range(self.size):
-            maxcol = self.counts[0][j]
-            maxcoli = 0
-            for i in range(1, len(self.alphabet) ):
-                if self.counts[i][j] > maxcol: 
-                    maxcol = self.counts[i][j]
-                    maxcoli = i
-            res += self.alphabet[maxcoli]        
-        return res
+    def consensus(self): #vai procurar o consensus na matriz dos counts por coluna (na PWM se o motif só tiver PWM)
+        mat = self.counts if self.counts is not None else self.pwm
+        return "".join(self.alphabet[i] for i, _ in argmaxColunas(mat))
 
     def maskedConsensus(self): #vai procurar o masked consensus que é a consensus mas só com as letras que tem uma incidência maior do que 50% em todas as seqs
-        res = ""
-        for j in range(self.size):
-            maxcol = self.counts[0][j]
-            maxcoli = 0
-            for i in range(1, len(self.alphabet) ):
-                if self.counts[i][j] > maxcol: 
-                    maxcol = self.counts[i][j]
-                    maxcoli = i
-            if maxcol > len(self.seqs) / 2:
-                res += self.alphabet[maxcoli]        
-            else:
-                res += "-"
-        return res
+        if self.counts is not None:
+            mat, metade = self.counts, len(self.seqs) / 2
+        else: #só PWM: probabilidade acima de 0.5
+            mat, metade = self.pwm, 0.5
+        return "".join(self.alphabet[i] if maxcol > metade else "-" for i, maxcol in argmaxColunas(mat))
 
     def probabSeq (self, seq): #vai calcular a probabilidade de a seq fazer parte deste quadro
-        res = 1.0
-        for i in range(self.size):
-            lin = self.alphabet.index(seq[i])
-            res *= self.pwm[lin][i]
-        return res
-    
+        return self.probAllPositions(seq[:self.size])[0]
+
+    def logOddsSeq(self, seq): #score log-odds de uma subseq com o tamanho do motif
+        return self.scan(seq[:self.size])[0]
+
     def probAllPositions(self, seq): #este em vez de calcular a probabilidade de acontecer devolve uma lista com as probabilidades de acontecer em cada letra da seq
-        res = []
-        for k in range(len(seq)-self.size+1):
-            res.append(self.probabSeq(seq))
-        return res
+        return varreJanelas(codigosSeq(seq, self.alphabet), self.tabPWM, mul)
 
     def mostProbableSeq(self, seq): #vai ver qual a posição inicial da subseq de uma seq de comprimento indefenido encaixa melhor no quandro de motifs das seqs
-        maximo = -1.0
-        maxind = -1
-        for k in range(len(seq)-self.size):
-            p = self.probabSeq(seq[k:k+ self.size])
-            if(p > maximo):
-                maximo = p
-                maxind = k
-        return maxind
+        return argmax(self.probAllPositions(seq))
+
+    def scan(self, seq):
+        """Scores log-odds de todas as janelas de seq (a seq é codificada uma vez e as janelas são todas avaliadas ao
+        mesmo tempo com varreJanelas); cria a PSSM com os valores por omissão se ainda não existir"""
+        if self.pssm is None: self.createPSSM()
+        return varreJanelas(codigosSeq(seq, self.alphabet), self.tabPSSM, add)
+
+    def scanArgmax(self, seq): #(posição, score) da melhor janela
+        scores = self.scan(seq)
+        i = argmax(scores)
+        return i, (scores[i] if i >= 0 else None)
+
+    def scanHits(self, seq, limiar): #[(posição, score)] das janelas com score >= limiar
+        return [(i, x) for i, x in enumerate(self.scan(seq)) if x >= limiar]
 
 def test():
     # test
@@ -109,5 +179,23 @@ def test():
     print(motifs.consensus())
     print(motifs.maskedConsensus())
 
+    soPWM = MyMotifs(pwm=motifs.pwm, alphabet=motifs.alphabet) #motif só com PWM: consensus a partir das probabilidades
+    assert soPWM.consensus() == motifs.consensus() and soPWM.maskedConsensus() == motifs.maskedConsensus()
+    for f in (soPWM.createPWM, lambda: MyMotifs([MySeq("ACGT"), MySeq("ACNT")])):
+        try:
+            f()
+            raise AssertionError("devia dar ValueError")
+        except ValueError as e:
+            print(e)
+
+    motifs.createPSSM(pseudo=1.0)
+    printMat(motifs.pssm)
+    print(motifs.scanArgmax("CTATAAACCTTACATC"))
+    print(motifs.scanHits("CTATAAACCTTACATCNAACCTT", 3.0))
+
+    motifs.createPSSM(pseudo=0) #sem pseudo-contagens: a coluna 2 não tem nenhum T
+    assert motifs.pssm[3][2] == -math.inf and motifs.scan("AATCCT")[0] == -math.inf
+    assert motifs.scan("AAACCT")[0] > 0
+
 if __name__ == '__main__':
     test()
@@ -1,8 +1,85 @@
+import re
+
+INVALIDO = 255 #código dado aos caracteres que não pertencem ao alfabeto
+
+def tabelaCodificacao(alf): #tabela para bytes.translate que converte cada letra do alfabeto no seu índice (A->0, C->1, ...)
+    tab = bytearray([INVALIDO]) * 256
+    for i, c in enumerate(alf):
+        tab[ord(c)] = i
+        tab[ord(c.lower())] = i
+    return bytes(tab)
+
+VALIDA_ER = {"dna": re.compile("[^ACTGactg]"),
+             "rna": re.compile("[^ACUGacug]"),
+             "protein": re.compile("[^ACDEFGHIKLMNPQRSTVWY_acdefghiklmnpqrstvwy]")}
+
+CODIGO_GENETICO = {"GCT":"A", "GCC":"A", "GCA":"A", "GCG":"A", "TGT":"C", "TGC":"C",
+      "GAT":"D", "GAC":"D","GAA":"E", "GAG":"E", "TTT":"F", "TTC":"F",
+      "GGT":"G", "GGC":"G", "GGA":"G", "GGG":"G","CAT":"H", "CAC":"H",
+      "ATA":"I", "ATT":"I", "ATC":"I",
+      "AAA":"K", "AAG":"K",
+      "TTA":"L", "TTG":"L", "CTT":"L", "CTC":"L", "CTA":"L", "CTG":"L",
+      "ATG":"M", "AAT":"N", "AAC":"N",
+      "CCT":"P", "CCC":"P", "CCA":"P", "CCG":"P",
+      "CAA":"Q", "CAG":"Q",
+      "CGT":"R", "CGC":"R", "CGA":"R", "CGG":"R", "AGA":"R", "AGG":"R",
+      "TCT":"S", "TCC":"S", "TCA":"S", "TCG":"S", "AGT":"S", "AGC":"S",
+      "ACT":"T", "ACC":"T", "ACA":"T", "ACG":"T",
+      "GTT":"V", "GTC":"V", "GTA":"V", "GTG":"V",
+      "TGG":"W",
+      "TAT":"Y", "TAC":"Y",
+      "TAA":"_", "TAG":"_", "TGA":"_"}
+
+# Tradução por tabela: com A=0, C=1, G=2, T=3 o índice de um codão é 16*b1 + 4*b2 + b3 (0..63).
+# As 3 bases de cada codão vêm de 3 fatias cods[k::3]; cada fatia é deslocada com translate e as 3 são juntas
+# com um OR de inteiros grandes (os bits não se sobrepõem). Uma base inválida liga o bit 64, e todos os índices
+# >= 64 traduzem para X.
+TABELA_TRADUCAO = bytes((ord(CODIGO_GENETICO["ACGT"[x >> 4] + "ACGT"[(x >> 2) & 3] + "ACGT"[x & 3]])
+                         if x < 64 else ord("X")) for x in range(256))
+DESLOCA_CODAO = [bytes((x << d) if x < 4 else 64 for x in range(256)) for d in (4, 2, 0)]
+COMPLEMENTO_CODIGOS = bytes((3 - x) if x < 4 else x for x in range(256))
+
+# Complementos com os códigos IUPAC (R<->Y, K<->M, B<->V, D<->H; S, W e N são o seu próprio complemento).
+# Os caracteres que não estão na tabela ficam como estão.
+IUPAC = "ACGTRYKMSWBDHVN"
+IUPAC_COMP = "TGCAYRMKSWVHDBN"
+COMPLEMENTO = {"dna": str.maketrans(IUPAC + IUPAC.lower(), IUPAC_COMP + IUPAC_COMP.lower()),
+               "rna": str.maketrans(IUPAC.replace("T", "U") + IUPAC.lower().replace("t", "u"),
+                                    IUPAC_COMP.replace("T", "U") + IUPAC_COMP.lower().replace("t", "u"))}
+COMPLEMENTO_BYTES = {t: bytes(range(256)).decode("latin-1").translate(COMPLEMENTO[t]).encode("latin-1")
+                     for t in COMPLEMENTO}
+TRANSCRICAO = str.maketrans("Tt", "Uu")
+TRANSCRICAO_BYTES = bytes.maketrans(b"Tt", b"Uu")
+
+def compInversoBytes(buf, tipo="dna"): #complemento inverso no próprio bytearray (sem criar uma nova seq)
+    buf[:] = buf.translate(COMPLEMENTO_BYTES[tipo])
+    buf.reverse()
+    return buf
+
+def transcricaoBytes(buf): #transcrição no próprio bytearray
+    buf[:] = buf.translate(TRANSCRICAO_BYTES)
+    return buf
+
+def traduzCodigos(cods, iniPos=0): #traduz bytes com códigos 0..3 (MySeq.codifica) a partir de iniPos, devolve str
+    n = (len(cods) - iniPos) // 3 #nº de codões completos
+    if n <= 0: return ""
+    idx = 0
+    for k in range(3):
+        fatia = cods[iniPos+k : iniPos+k+3*n : 3].translate(DESLOCA_CODAO[k])
+        idx |= int.from_bytes(fatia, "little")
+    return idx.to_bytes(n, "little").translate(TABELA_TRADUCAO).decode("ascii")
+
+def compInversoCodigos(cods): #complemento inverso feito diretamente sobre os códigos (A<->T, C<->G)
+    return cods[::-1].translate(COMPLEMENTO_CODIGOS)
+
+
 class MySeq:
 
-    def __init__(self, seq, tipo="dna"):
+    def __init__(self, seq, tipo="dna", nome=None, qualidade=None):
         self.seq = seq.upper() #seq com letras maiusculas
         self.tipo = tipo #definir qual é o tipo de seq
+        self.nome = nome #cabeçalho do registo FASTA/FASTQ de onde veio a seq (se veio de um ficheiro)
+        self.qualidade = qualidade #qualidades FASTQ (str com os caracteres phred), None se não houver
 
     def __len__(self):
         return len(self.seq) #dá return do comprimento da seq
@@ -25,92 +102,54 @@ class MySeq:
         elif (self.tipo=="protein"): return "ACDEFGHIKLMNPQRSTVWY"
         else: return None
     
-    def valida(self): #vai ver se a seq é válida consoante ao tipo definido
+    def codifica(self): #converte a seq em bytes com o índice de cada letra no alfabeto, numa só passagem (bytes.translate)
         alf = self.alfabeto()
-        res = True
-        i = 0
-        while i < len(self.seq) and res:
-            if self.seq[i] not in alf: 
-                res = False
-            else: i += 1
-        return res 
+        if alf is None: return None
+        return self.seq.encode("ascii", "replace").translate(tabelaCodificacao(alf))
+
+    def compacta(self): #devolve a mesma seq guardada com 2 bits por base (só para dna/rna)
+        from MySeqPacked import MySeqPacked
+        return MySeqPacked(self.seq, self.tipo, self.nome, self.qualidade)
+
+    def valida(self): #vai ver se a seq é válida consoante ao tipo definido: apaga as letras do alfabeto e vê se sobra algo
+        alf = self.alfabeto()
+        if alf is None: return False
+        return not self.seq.encode("ascii", "replace").translate(None, alf.encode())
     
-    def validaER(self): #vai validar as seqs com expressões regulares
-        import re
-        if (self.tipo=="dna"):
-            if re.search("[^ACTGactg]", self.seq) != None: return False
-            else: return True 
-        elif (self.tipo=="rna"):
-            if re.search("[^ACUGacug]", self.seq) != None:  return False
-            else: return True
-        elif (self.tipo=="protein"):
-            if re.search("[^ACDEFGHIKLMNPQRSTVWY_acdefghiklmnpqrstvwy]", self.seq) != None:
-                return False
-            else: return True
-        else: return False    
+    def validaER(self): #vai validar as seqs com expressões regulares (compiladas uma só vez, em VALIDA_ER)
+        if self.tipo not in VALIDA_ER: return False
+        return VALIDA_ER[self.tipo].search(self.seq) is None
     
     def transcricao (self): #vai tranformar uma seq de DNA em RNA
         if (self.tipo == "dna"):
-            return MySeq(self.seq.replace("T","U"), "rna")
+            return MySeq(self.seq.translate(TRANSCRICAO), "rna")
         else:
             return None
+
+    def complemento(self): #complemento da seq (dna ou rna), mantendo os códigos IUPAC
+        if (self.tipo not in COMPLEMENTO): return None
+        return MySeq(self.seq.translate(COMPLEMENTO[self.tipo]), self.tipo)
         
-    def compInverso(self): #vai fazer o a cadeia inversa de DNA do self.seq
-        if (self.tipo != "dna"): return None
-        comp = ""
-        for c in self.seq:
-            if (c == 'A'):
-                comp = "T" + comp 
-            elif (c == "T"): 
-                comp = "A" + comp 
-            elif (c == "G"): 
-                comp = "C" + comp
-            elif (c== "C"): 
-                comp = "G" + comp
-        return MySeq(comp)
+    def compInverso(self): #vai fazer o a cadeia inversa de DNA do self.seq, numa só passagem com str.translate
+        if (self.tipo not in COMPLEMENTO): return None
+        return MySeq(self.seq.translate(COMPLEMENTO[self.tipo])[::-1], self.tipo)
 
     def traduzSeq (self, iniPos= 0): #vai traduzir a sequência se esta dor DNA, com inicio na posição iniPOS
         if (self.tipo != "dna"): return None
-        seqM = self.seq
-        seqAA = ""
-        for pos in range(iniPos,len(seqM)-2,3):
-            cod = seqM[pos:pos+3]
-            seqAA += self.traduzCodao(cod)
-        return MySeq(seqAA, "protein")
+        return MySeq(traduzCodigos(self.codifica(), iniPos), "protein")
 
     def orfs (self): #vai ver todas as possíveis traduções a partir de uma seq, sendo sito a começar nas posições de aminoácidos e nas inversas
         if (self.tipo != "dna"): return None
+        cods = self.codifica() #a seq só é codificada uma vez para as 6 frames
+        inv = compInversoCodigos(cods)
         res = []
-        res.append(self.traduzSeq(0))
-        res.append(self.traduzSeq(1))
-        res.append(self.traduzSeq(2))
-        compinv = self.compInverso()
-        res.append(compinv.traduzSeq(0))
-        res.append(compinv.traduzSeq(1))
-        res.append(compinv.traduzSeq(2))    
+        for c in (cods, inv):
+            for iniPos in range(3):
+                res.append(MySeq(traduzCodigos(c, iniPos), "protein"))
         return res
 
     def traduzCodao (self, cod): #código responsável por fazer a ligação entre um codão e um aminoácido
-        tc = {"GCT":"A", "GCC":"A", "GCA":"A", "GCC":"A", "TGT":"C", "TGC":"C",
-      "GAT":"D", "GAC":"D","GAA":"E", "GAG":"E", "TTT":"F", "TTC":"F",
-      "GGT":"G", "GGC":"G", "GGA":"G", "GGG":"G","CAT":"H", "CAC":"H",
-      "ATA":"I", "ATT":"I", "ATC":"I",
-      "AAA":"K", "AAG":"K",
-      "TTA":"L", "TTG":"L", "CTT":"L", "CTC":"L", "CTA":"L", "CTG":"L",
-      "ATG":"M", "AAT":"N", "AAC":"N",
-      "CCT":"P", "CCC":"P", "CCA":"P", "CCG":"P",
-      "CAA":"Q", "CAG":"Q",
-      "CGT":"R", "CGC":"R", "CGA":"R", "CGG":"R", "AGA":"R", "AGG":"R",
-      "TCT":"S", "TCC":"S", "TCA":"S", "TCG":"S", "AGT":"S", "AGC":"S",
-      "ACT":"T", "ACC":"T", "ACA":"T", "ACG":"T",
-      "GTT":"V", "GTC":"V", "GTA":"V", "GTG":"V",
-      "TGG":"W",
-      "TAT":"Y", "TAC":"Y",
-      "TAA":"_", "TAG":"_", "TGA":"_"}
-        if cod in tc:
-            aa = tc[cod]
-        else: aa = "X" # errors marked with X
-        return aa
+        return CODIGO_GENETICO.get(cod, "X") # errors marked with X
 
     def traduzCodaoER (self,cod): #função responsável por traduzir codãp mas com expressões regulares
         import re
@@ -174,32 +213,33 @@ class MySeq:
         if (self.tipo != "protein"):
             return None
         seqAA = self.seq
-        protsAtuais = [] #proteina atual
         proteinas = [] #proteian final
-        for aa in seqAA:
-            if aa == "_":
-                if protsAtuais:
-                    for p in protsAtuais:
-                        proteinas.append(MySeq(p, "protein"))
-                    protsAtuais = []
-            else:
-                if aa == "M":
-                    protsAtuais.append("")
-                for i in range(len(protsAtuais)): #i só vai variar se encontrar mais M anted de encontrar algum _
-                    protsAtuais[i] += aa
-
+        pos = 0
+        stop = seqAA.find("_")
+        while stop != -1: #cada M antes de um _ dá uma proteína que vai desse M até ao _, sem juntar letra a letra
+            m = seqAA.find("M", pos, stop)
+            while m != -1:
+                proteinas.append(MySeq(seqAA[m:stop], "protein"))
+                m = seqAA.find("M", m + 1, stop)
+            pos = stop + 1
+            stop = seqAA.find("_", pos)
         return proteinas
 
-    
+    def encontraORFs(self, minLen=0, aninhadas=False): #gerador das ORFs das 6 frames (ver ORFFinder.encontraORFs)
+        if (self.tipo != "dna"):
+            return None
+        from ORFFinder import encontraORFs
+        return encontraORFs(self, minLen, aninhadas)
+
     def maiorProteinaORFs (self): #vai ver qual é a maior prteina codificada por uma seq de DNA
         if (self.tipo != "dna"):
             return None
-        larg = MySeq("","protein")
-        for orf in self.orfs():
-            prot = orf.maiorProteinaER()
-            if len(prot.seq)>len(larg.seq):
-                larg = prot
-        return larg
+        larg = None
+        for orf in self.encontraORFs(): #só guarda as posições, e no fim traduz apenas a maior
+            if larg is None or orf.length > larg.length:
+                larg = orf
+        if larg is None: return MySeq("","protein")
+        return larg.proteina(comStop=True)
 
 
 
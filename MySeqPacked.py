@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import re
+from bisect import bisect_right
+
+from MySeq import MySeq, INVALIDO, COMPLEMENTO
+
+# Cada base ocupa 2 bits (A=0, C=1, G=2, T/U=3), 4 bases por byte: a base i fica no byte i//4, nos bits 2*(i%4).
+# Os caracteres fora do alfabeto (N, IUPAC, ...) são guardados com o código 0 e registados numa máscara à parte,
+# como corridas (posição inicial, texto da corrida), que é pequena em genomas reais.
+
+LETRAS = {"dna": "ACGT", "rna": "ACGU"}
+
+def tabelaCodigos(alf): #letra -> código de 2 bits, o que não é do alfabeto fica a 0 (depois é corrigido pela máscara)
+    tab = bytearray(256)
+    for i, c in enumerate(alf):
+        tab[ord(c)] = i
+        tab[ord(c.lower())] = i
+    return bytes(tab)
+
+def tabelaDesloca(k): #código -> código deslocado para a posição k dentro do byte
+    return bytes(((x << (2*k)) & 0xFF) for x in range(256))
+
+def tabelaExtrai(k, simbolos): #byte compactado -> símbolo da base k desse byte
+    return bytes(simbolos[(x >> (2*k)) & 3] for x in range(256))
+
+def tabelaInverte(x): #complementa as 4 bases do byte (código 3-c, ou seja c^3) e inverte a ordem delas
+    x ^= 0xFF
+    return sum(((x >> (2*k)) & 3) << (2*(3-k)) for k in range(4))
+
+DESLOCA = [tabelaDesloca(k) for k in range(4)]
+COMP_INVERTE = bytes(tabelaInverte(x) for x in range(256))
+COMP_BYTE = bytes(x ^ 0xFF for x in range(256))
+EXTRAI_CODIGO = [tabelaExtrai(k, bytes(range(4))) for k in range(4)]
+EXTRAI_LETRA = {t: [tabelaExtrai(k, LETRAS[t].encode()) for k in range(4)] for t in LETRAS}
+CODIGOS = {t: tabelaCodigos(LETRAS[t]) for t in LETRAS}
+
+
+def compactaCodigos(cods):
+    """Compacta bytes com códigos 0..3 (um por base) em 4 bases por byte.
+    As 4 fatias cods[k::4] são deslocadas com translate e juntas com um OR de inteiros grandes, tudo em C."""
+    m = (len(cods) + 3) // 4
+    res = 0
+    for k in range(4):
+        fatia = cods[k::4].translate(DESLOCA[k])
+        res |= int.from_bytes(fatia, "little")
+    return bytearray(res.to_bytes(m, "little"))
+
+def descompacta(dados, i, j, tabelas):
+    """Devolve as bases [i, j) de dados como bytes (letras ou códigos, conforme as tabelas), lendo só os bytes necessários"""
+    if j <= i: return b""
+    b0 = i >> 2
+    b1 = (j + 3) >> 2
+    bloco = bytes(dados[b0:b1])
+    res = bytearray(4 * len(bloco))
+    for k in range(4):
+        res[k::4] = bloco.translate(tabelas[k])
+    ini = i - 4*b0
+    return bytes(res[ini:ini + j - i])
+
+
+class MySeqPacked(MySeq):
+
+    def __init__(self, seq, tipo="dna", nome=None, qualidade=None):
+        if tipo not in LETRAS:
+            raise ValueError("A compactação a 2 bits só existe para dna e rna")
+        self.tipo = tipo
+        self.nome = nome
+        self.qualidade = qualidade
+        if isinstance(seq, str):
+            seq = seq.encode("ascii", "replace")
+        seq = bytes(seq).upper()
+        self.n = len(seq)
+        self.dados = compactaCodigos(seq.translate(CODIGOS[tipo]))
+        self.ambIni = [] #posição inicial de cada corrida de caracteres ambíguos
+        self.ambSeq = [] #texto de cada corrida
+        for m in re.finditer(b"[^" + LETRAS[tipo].encode() + b"]+", seq):
+            self.ambIni.append(m.start())
+            self.ambSeq.append(m.group().decode("ascii"))
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def seq(self): #os métodos herdados de MySeq usam self.seq, por isso descompactamos tudo só quando são chamados
+        return self.regiao(0, self.n)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            i, j, passo = n.indices(self.n)
+            if passo == 1:
+                return self.regiao(i, j)
+            lo, hi = (i, j) if passo > 0 else (j + 1, i + 1)
+            return self.regiao(lo, hi)[(i - lo)::passo] if hi > lo else ""
+        if n < 0: n += self.n
+        if n < 0 or n >= self.n:
+            raise IndexError("índice fora da sequência")
+        amb = self.ambiguo(n)
+        if amb is not None: return amb
+        return LETRAS[self.tipo][(self.dados[n >> 2] >> (2*(n & 3))) & 3]
+
+    def ambiguo(self, n): #devolve o caracter ambíguo na posição n, ou None se a posição não estiver na máscara
+        r = bisect_right(self.ambIni, n) - 1
+        if r >= 0 and n < self.ambIni[r] + len(self.ambSeq[r]):
+            return self.ambSeq[r][n - self.ambIni[r]]
+        return None
+
+    def corridasAmbiguas(self, i, j): #corridas da máscara que se sobrepõem a [i, j), como (início, fim, texto)
+        r = max(bisect_right(self.ambIni, i) - 1, 0)
+        while r < len(self.ambIni) and self.ambIni[r] < j:
+            ini = self.ambIni[r]
+            fim = ini + len(self.ambSeq[r])
+            if fim > i:
+                yield ini, fim, self.ambSeq[r]
+            r += 1
+
+    def regiao(self, i, j): #devolve a subseq [i, j) como str, descompactando só os bytes que a contêm
+        res = bytearray(descompacta(self.dados, i, j, EXTRAI_LETRA[self.tipo]))
+        for ini, fim, txt in self.corridasAmbiguas(i, j):
+            a, b = max(ini, i), min(fim, j)
+            res[a-i:b-i] = txt[a-ini:b-ini].encode("ascii")
+        return res.decode("ascii")
+
+    def codigos(self, i=0, j=None):
+        """Devolve as bases [i, j) como bytes de códigos 0..3 (índice no alfabeto), com os ambíguos a INVALIDO,
+        no mesmo formato de MySeq.codifica"""
+        if j is None: j = self.n
+        res = bytearray(descompacta(self.dados, i, j, EXTRAI_CODIGO))
+        for ini, fim, txt in self.corridasAmbiguas(i, j):
+            a, b = max(ini, i), min(fim, j)
+            res[a-i:b-i] = bytes([INVALIDO]) * (b - a)
+        return bytes(res)
+
+    def codifica(self):
+        return self.codigos()
+
+    def copia(self):
+        res = MySeqPacked.__new__(MySeqPacked)
+        res.tipo = self.tipo
+        res.nome = self.nome
+        res.qualidade = self.qualidade
+        res.n = self.n
+        res.dados = bytearray(self.dados)
+        res.ambIni = list(self.ambIni)
+        res.ambSeq = list(self.ambSeq)
+        return res
+
+    def limpaPadding(self): #põe a 0 os bits que sobram no último byte (n não múltiplo de 4)
+        if self.n & 3:
+            self.dados[-1] &= (1 << (2*(self.n & 3))) - 1
+
+    def complementoInPlace(self): #complemento sobre os próprios bytes: o complemento de um código de 2 bits é c^3
+        self.dados[:] = self.dados.translate(COMP_BYTE)
+        self.limpaPadding()
+        self.ambSeq = [x.translate(COMPLEMENTO[self.tipo]) for x in self.ambSeq]
+        return self
+
+    def compInversoInPlace(self):
+        """Complemento inverso sobre os próprios bytes: inverte a ordem dos bytes, complementa e inverte as 4 bases
+        de cada byte com uma tabela, e no fim desloca tudo para tirar as bases de padding que ficaram no início"""
+        self.dados.reverse()
+        self.dados[:] = self.dados.translate(COMP_INVERTE)
+        pad = 4*len(self.dados) - self.n
+        if pad:
+            x = int.from_bytes(self.dados, "little") >> (2*pad)
+            self.dados[:] = x.to_bytes(len(self.dados), "little")
+        self.ambIni = [self.n - ini - len(txt) for ini, txt in zip(self.ambIni, self.ambSeq)][::-1]
+        self.ambSeq = [txt.translate(COMPLEMENTO[self.tipo])[::-1] for txt in self.ambSeq][::-1]
+        return self
+
+    def transcricaoInPlace(self): #no formato compactado T e U têm o mesmo código, basta mudar o tipo
+        if self.tipo != "dna": return None
+        self.tipo = "rna"
+        return self
+
+    def complemento(self):
+        return self.copia().complementoInPlace()
+
+    def compInverso(self):
+        return self.copia().compInversoInPlace()
+
+    def transcricao(self):
+        if self.tipo != "dna": return None
+        return self.copia().transcricaoInPlace()
+
+    def compacta(self):
+        return self
+
+    def memoria(self): #nº aproximado de bytes ocupados pela seq compactada e pela máscara
+        return len(self.dados) + sum(len(x) for x in self.ambSeq) + 8 * len(self.ambIni)
+
+
+def test():
+    s = MySeqPacked("ATGNNNCGTRACGTTAGu")
+    print(len(s), s.seq)
+    print(s[0], s[4], s[9], s[-1])
+    print(s[2:12], s[::3], s[10:2:-2])
+    print(list(s.codigos(0, 8)))
+    print(s.memoria(), "bytes")
+
+if __name__ == "__main__":
+    test()
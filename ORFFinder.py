@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+from MySeq import MySeq, traduzCodigos, compInversoCodigos
+
+
+class ORF:
+    """ORF encontrada numa seq de DNA. As coordenadas são sempre na cadeia direta, [start, end), e incluem o codão stop;
+    frame 0..2 são as frames diretas e 3..5 as do complemento inverso (pela mesma ordem de MySeq.orfs);
+    length é o nº de aminoácidos sem o stop. A proteína só é traduzida quando é pedida."""
+
+    def __init__(self, seq, frame, start, end, length):
+        self.seq = seq #seq de DNA de onde vem a ORF
+        self.frame = frame
+        self.start = start
+        self.end = end
+        self.length = length
+
+    def __repr__(self):
+        return f"ORF(frame={self.frame}, start={self.start}, end={self.end}, length={self.length})"
+
+    def strand(self):
+        return "+" if self.frame < 3 else "-"
+
+    def proteina(self, comStop=False): #traduz só a região da ORF
+        cods = MySeq(self.seq[self.start:self.end]).codifica()
+        if self.frame >= 3:
+            cods = compInversoCodigos(cods)
+        prot = traduzCodigos(cods)
+        return MySeq(prot if comStop else prot[:-1], "protein")
+
+
+def encontraORFs(seq, minLen=0, aninhadas=False):
+    """Gerador das ORFs (M ... stop) das 6 frames de uma seq de DNA, uma frame de cada vez.
+    Cada frame é traduzida de uma vez (MySeq.traduzCodigos) e depois só se procuram as posições dos stops e dos M com
+    str.find, guardando inteiros. Por defeito só dá a ORF mais longa de cada segmento entre stops (o primeiro M);
+    com aninhadas=True dá também as que começam nos M seguintes do mesmo segmento.
+    minLen é o nº mínimo de aminoácidos (sem o stop)."""
+    cods = seq.codifica()
+    n = len(cods)
+    inv = None
+    for frame in range(6):
+        if frame < 3:
+            prot = traduzCodigos(cods, frame)
+        else:
+            if inv is None: inv = compInversoCodigos(cods)
+            prot = traduzCodigos(inv, frame - 3)
+        ini = frame % 3
+        pos = 0
+        stop = prot.find("_")
+        while stop != -1:
+            m = prot.find("M", pos, stop)
+            while m != -1 and stop - m >= minLen:
+                s, e = ini + 3*m, ini + 3*(stop + 1) #coordenadas na cadeia traduzida
+                if frame >= 3: s, e = n - e, n - s
+                yield ORF(seq, frame, s, e, stop - m)
+                if not aninhadas: break
+                m = prot.find("M", m + 1, stop)
+            pos = stop + 1
+            stop = prot.find("_", pos)
+
+
+def test():
+    s = MySeq("ATGAAATAGCCATGCATGTTTTGACTACATTTTCAT")
+    for orf in encontraORFs(s, aninhadas=True):
+        print(orf, orf.strand(), orf.proteina().seq)
+    print([o.length for o in encontraORFs(s, minLen=2)])
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from MySeq import MySeq
+
+
+def alfabetoTipo(tipo): #o mesmo alfabeto que MySeq.alfabeto() dá a uma seq deste tipo
+    alf = MySeq("", tipo).alfabeto()
+    if alf is None:
+        raise ValueError(f"Tipo de seq desconhecido: {tipo}")
+    return alf
+
+def tabelaInvalidos(alf): #tabela para translate: letras do alfabeto (maiúsculas ou minúsculas) -> 0, tudo o resto -> 1
+    tab = bytearray([1]) * 256
+    for c in alf:
+        tab[ord(c)] = 0
+        tab[ord(c.lower())] = 0
+    return bytes(tab)
+
+
+def validaIntervalos(buf, intervalos, tipo="dna"):
+    """Valida as seqs de um buffer (bytes, maiúsculas ou minúsculas) dadas como intervalos [início, fim).
+    O buffer inteiro passa uma só vez pela tabela de inválidos (translate) e depois cada seq é tratada com find/count
+    sobre a sua fatia, sem cópias. Devolve um {} de colunas, uma entrada por seq: valida, primeiroInvalido
+    (-1 se válida), comprimento, gc (só dna/rna) e composicao (letra -> lista de contagens)."""
+    alf = alfabetoTipo(tipo)
+    flags = buf.translate(tabelaInvalidos(alf))
+    res = {"valida": [], "primeiroInvalido": [], "comprimento": [], "gc": [],
+           "composicao": {c: [] for c in alf}}
+    letras = [(c, ord(c), ord(c.lower()), res["composicao"][c]) for c in alf]
+    for ini, fim in intervalos:
+        inv = flags.find(1, ini, fim)
+        res["valida"].append(inv == -1)
+        res["primeiroInvalido"].append(inv - ini if inv != -1 else -1)
+        res["comprimento"].append(fim - ini)
+        cont = {}
+        for c, o, ol, col in letras: #a composição junta as duas caixas (reads com soft-masking)
+            cont[c] = buf.count(o, ini, fim) + buf.count(ol, ini, fim)
+            col.append(cont[c])
+        if tipo == "protein":
+            res["gc"].append(None)
+        else:
+            res["gc"].append((cont["G"] + cont["C"]) / (fim - ini) if fim > ini else 0.0)
+    return res
+
+def validaBuffer(buf, tipo="dna", sep=b"\n"):
+    """Valida um buffer grande com várias seqs separadas por sep (ex: um read por linha)"""
+    intervalos = []
+    ini = 0
+    n = len(buf)
+    while ini < n:
+        fim = buf.find(sep, ini)
+        if fim == -1: fim = n
+        intervalos.append((ini, fim))
+        ini = fim + len(sep)
+    return validaIntervalos(buf, intervalos, tipo)
+
+def validaLote(seqs, tipo=None):
+    """Valida uma lista de MySeq (ou str/bytes): junta tudo num só buffer e valida-o com validaIntervalos.
+    O tipo vem da primeira MySeq se não for dado."""
+    seqs = list(seqs)
+    if tipo is None:
+        tipo = seqs[0].tipo if seqs and isinstance(seqs[0], MySeq) else "dna"
+    partes = []
+    intervalos = []
+    pos = 0
+    for s in seqs:
+        if isinstance(s, MySeq): s = s.seq
+        s = s.encode("ascii", "replace") if isinstance(s, str) else bytes(s)
+        partes.append(s.upper())
+        intervalos.append((pos, pos + len(s)))
+        pos += len(s)
+    return validaIntervalos(b"".join(partes), intervalos, tipo)
+
+def resumo(res): #composição e GC totais de um resultado de validaBuffer/validaLote
+    comp = {c: sum(v) for c, v in res["composicao"].items()}
+    total = sum(res["comprimento"])
+    out = {"nseqs": len(res["valida"]), "validas": sum(res["valida"]), "bases": total, "composicao": comp}
+    if "G" in comp and "C" in comp:
+        out["gc"] = (comp["G"] + comp["C"]) / total if total else 0.0
+    return out
+
+
+def test():
+    seqs = [MySeq("ACGTGGCC"), MySeq("ACNTG"), MySeq(""), MySeq("gggc")]
+    res = validaLote(seqs)
+    print(res["valida"], res["primeiroInvalido"], res["gc"])
+    print(res["composicao"])
+    print(resumo(res))
+    print(validaBuffer(b"ACDEF\nXXA\n", "protein")["primeiroInvalido"])
+    print(resumo(validaBuffer(b"ACgtNN\nacgt\n")))
+
+if __name__ == "__main__":
+    test()
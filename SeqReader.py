@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import mmap
+
+from MySeq import MySeq
+
+BLOCO = 1 << 22 #tamanho dos blocos lidos do disco (4 MB)
+
+
+def abre(path):
+    """Abre um ficheiro em binário com um buffer grande; se começar pelos bytes mágicos do gzip é descomprimido"""
+    f = open(path, "rb", buffering=BLOCO)
+    if f.peek(2)[:2] == b"\x1f\x8b":
+        return io.BufferedReader(gzip.GzipFile(fileobj=f, mode="rb"), buffer_size=BLOCO)
+    return f
+
+def criaSeq(nome, partes, tipo, compactado, qualidade=None):
+    seq = b"".join(partes)
+    if compactado:
+        from MySeqPacked import MySeqPacked
+        return MySeqPacked(seq, tipo, nome, qualidade)
+    return MySeq(seq.decode("ascii", "replace"), tipo, nome, qualidade)
+
+
+def readFasta(path, tipo="dna", compactado=False):
+    """Gerador dos registos de um FASTA (pode ter várias linhas por seq e estar em gzip), um MySeq de cada vez.
+    O nome fica em MySeq.nome (cabeçalho sem o '>'). Com compactado=True devolve MySeqPacked."""
+    with abre(path) as f:
+        nome = None
+        partes = []
+        for linha in f:
+            if linha[:1] == b">":
+                if nome is not None:
+                    yield criaSeq(nome, partes, tipo, compactado)
+                nome = linha[1:].rstrip().decode("ascii", "replace")
+                partes = []
+            elif nome is not None:
+                partes.append(linha.rstrip())
+        if nome is not None:
+            yield criaSeq(nome, partes, tipo, compactado)
+
+def readFastq(path, tipo="dna", compactado=False):
+    """Gerador dos registos de um FASTQ (pode estar em gzip), com a qualidade em MySeq.qualidade.
+    Aceita seqs e qualidades partidas em várias linhas: a qualidade acaba quando tem o tamanho da seq."""
+    with abre(path) as f:
+        linhas = iter(f)
+        for linha in linhas:
+            if not linha.strip(): continue
+            if linha[:1] != b"@":
+                raise ValueError("Registo FASTQ sem '@': " + linha[:50].decode("ascii", "replace"))
+            nome = linha[1:].rstrip().decode("ascii", "replace")
+            partes = []
+            for linha in linhas:
+                if linha[:1] == b"+": break
+                partes.append(linha.rstrip())
+            tam = sum(len(x) for x in partes)
+            qual = []
+            lidos = 0
+            while lidos < tam:
+                q = next(linhas, b"").rstrip()
+                if not q:
+                    raise ValueError("Registo FASTQ truncado: " + nome)
+                qual.append(q)
+                lidos += len(q)
+            yield criaSeq(nome, partes, tipo, compactado, b"".join(qual).decode("ascii"))
+
+def readSeqs(path, tipo="dna", compactado=False):
+    """Lê FASTA ou FASTQ conforme o primeiro caracter do ficheiro ('>' ou '@')"""
+    with abre(path) as f:
+        primeiro = f.read(1)
+    if primeiro == b"@":
+        return readFastq(path, tipo, compactado)
+    return readFasta(path, tipo, compactado)
+
+
+# Acesso sem cópias através de mmap (só para ficheiros não comprimidos)
+
+def registosMmap(path):
+    """Gerador de (nome, memoryview) para cada registo de um FASTA, ou (nome, seq, qualidade) para um FASTQ, em que as
+    memoryviews são fatias do ficheiro mapeado em memória, sem cópias. Numa seq partida em várias linhas a vista inclui
+    as mudanças de linha (usar juntaLinhas); os FASTQ de 4 linhas dão sempre vistas só com as bases/qualidades."""
+    with open(path, "rb") as f:
+        if f.read(2) == b"\x1f\x8b":
+            raise ValueError("Um ficheiro gzip não pode ser mapeado em memória, usar readFasta/readFastq")
+        if f.seek(0, 2) == 0: return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) #o mapa continua válido depois de fechar o ficheiro
+    mv = memoryview(mm)
+    fastq = mm[:1] == b"@"
+    pos = 0
+    n = len(mm)
+    while pos < n:
+        fimCab = mm.find(b"\n", pos)
+        if fimCab == -1: fimCab = n
+        nome = mm[pos+1:fimCab].rstrip().decode("ascii", "replace")
+        ini = fimCab + 1
+        if fastq:
+            fimSeq = mm.find(b"\n", ini)
+            fimMais = mm.find(b"\n", fimSeq + 1)
+            fimQual = mm.find(b"\n", fimMais + 1)
+            if fimSeq == -1 or fimMais == -1:
+                raise ValueError("Registo FASTQ truncado: " + nome)
+            if fimQual == -1: fimQual = n
+            yield nome, tiraCR(mv, ini, fimSeq), tiraCR(mv, fimMais + 1, fimQual)
+            pos = fimQual + 1
+        else:
+            prox = mm.find(b"\n>", fimCab)
+            fim = n if prox == -1 else prox
+            yield nome, tiraCR(mv, min(ini, fim), fim)
+            pos = fim + 1
+
+def tiraCR(mv, i, j): #fatia [i, j) sem o '\r' final (ficheiros com mudanças de linha do Windows)
+    while j > i and mv[j-1] in (10, 13):
+        j -= 1
+    return mv[i:j]
+
+def juntaLinhas(mv): #copia a seq de uma vista retirando as mudanças de linha
+    return bytes(mv).replace(b"\r", b"").replace(b"\n", b"")
+
+
+def test():
+    import os, tempfile
+    d = tempfile.mkdtemp()
+    fa = os.path.join(d, "ex.fa.gz")
+    with gzip.open(fa, "wb") as f:
+        f.write(b">seq1 exemplo\nACGTAC\nGTNN\n>seq2\nacgt\n")
+    for s in readSeqs(fa):
+        print(s.nome, s)
+    fq = os.path.join(d, "ex.fq")
+    with open(fq, "wb") as f:
+        f.write(b"@r1\nACGT\n+\nIIII\n@r2\nGGCA\n+r2\n#II!\n")
+    for s in readSeqs(fq):
+        print(s.nome, s, s.qualidade)
+    for nome, seq, qual in registosMmap(fq):
+        print(nome, bytes(seq), bytes(qual))
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import math
+from collections import deque
+from multiprocessing import Pool
+
+from KmerCounter import kmersIter
+
+MASCARA64 = (1 << 64) - 1
+
+
+def hash64(x): #mistura de bits do splitmix64: espalha os k-mers inteiros (que são muito parecidos entre si) por 64 bits
+    x = (x + 0x9E3779B97F4A7C15) & MASCARA64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASCARA64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASCARA64
+    return x ^ (x >> 31)
+
+
+class Sketch:
+    """Sketch bottom-s (MinHash) de uma seq: os s menores hashes distintos dos seus k-mers canónicos"""
+
+    def __init__(self, k, s, hashes, nkmers, nome=None):
+        self.k = k
+        self.s = s
+        self.hashes = hashes #lista ordenada
+        self.nkmers = nkmers #nº de k-mers (com repetições) vistos na seq
+        self.nome = nome
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __repr__(self):
+        return f"Sketch(nome={self.nome}, k={self.k}, s={self.s}, hashes={len(self.hashes)})"
+
+
+def sketch(seq, k=21, s=1000, canonico=True):
+    """Calcula o sketch numa só passagem pelos k-mers: um heap de máximo com os s menores hashes e um set para não
+    repetir hashes; cada hash novo só entra se for menor do que o maior dos guardados"""
+    heap = [] #guarda -hash, para o topo ser o maior hash
+    guardados = set()
+    n = 0
+    for _, x in kmersIter(seq, k, canonico):
+        n += 1
+        h = hash64(x)
+        if h in guardados: continue
+        if len(heap) < s:
+            heapq.heappush(heap, -h)
+            guardados.add(h)
+        elif h < -heap[0]:
+            guardados.discard(-heapq.heapreplace(heap, -h))
+            guardados.add(h)
+    return Sketch(k, s, sorted(guardados), n, getattr(seq, "nome", None))
+
+def minimizers(seq, k=15, w=10, canonico=True):
+    """Minimizers (posição, hash): o k-mer de menor hash em cada janela de w k-mers consecutivos, sem repetir o mesmo
+    minimizer em janelas seguidas. Usa uma fila monótona, por isso é linear no tamanho da seq."""
+    res = []
+    fila = deque() #(índice do k-mer, posição, hash) com hashes crescentes
+    ultimo = None
+    i = -1
+    inicio = 0 #índice do primeiro k-mer do troço atual
+    anterior = None
+    for pos, x in kmersIter(seq, k, canonico):
+        if anterior is not None and pos != anterior + 1: #uma base inválida parte a seq: recomeça as janelas
+            fila.clear()
+            inicio = i + 1
+        anterior = pos
+        i += 1
+        h = hash64(x)
+        while fila and fila[-1][2] >= h:
+            fila.pop()
+        fila.append((i, pos, h))
+        while fila[0][0] <= i - w:
+            fila.popleft()
+        if i - inicio >= w - 1:
+            m = (fila[0][1], fila[0][2])
+            if m != ultimo:
+                res.append(m)
+                ultimo = m
+    return res
+
+
+# Estimativas a partir dos sketches
+
+def comuns(a, b):
+    """Devolve (nº de hashes partilhados entre os s menores da união, nº de hashes da união considerados)"""
+    s = min(a.s, b.s)
+    i = j = partilhados = usados = 0
+    ha, hb = a.hashes, b.hashes
+    while usados < s and (i < len(ha) or j < len(hb)):
+        if j >= len(hb) or (i < len(ha) and ha[i] < hb[j]):
+            i += 1
+        elif i >= len(ha) or hb[j] < ha[i]:
+            j += 1
+        else:
+            partilhados += 1
+            i += 1
+            j += 1
+        usados += 1
+    return partilhados, usados
+
+def jaccard(a, b):
+    if a.k != b.k:
+        raise ValueError("Os sketches têm k diferentes")
+    partilhados, usados = comuns(a, b)
+    return partilhados / usados if usados else 0.0
+
+def containment(a, b):
+    """Estimativa da fração dos k-mers de a que estão em b (|A∩B| / |A|), comparando só os hashes abaixo do limite em
+    que os dois sketches estão completos"""
+    if not a.hashes or not b.hashes: return 0.0
+    limite = min(a.hashes[-1], b.hashes[-1])
+    hb = set(b.hashes)
+    emA = [h for h in a.hashes if h <= limite]
+    return sum(1 for h in emA if h in hb) / len(emA)
+
+def mashDistance(a, b): #distância de Mash: estimativa da divergência por base a partir do Jaccard
+    j = jaccard(a, b)
+    if j == 0: return 1.0
+    return -1.0 / a.k * math.log(2 * j / (1 + j))
+
+
+# Todos contra todos
+
+def sketchTrabalho(args):
+    seq, k, s = args
+    return sketch(seq, k, s)
+
+MEDIDAS = {"jaccard": jaccard, "containment": containment, "mash": mashDistance}
+PARTILHADO = {} #sketches de todas as seqs, copiados uma vez para cada processo pelo initializer
+
+def iniciaLinhas(sketches, medida):
+    PARTILHADO["sketches"] = sketches
+    PARTILHADO["medida"] = MEDIDAS[medida]
+
+def linhaTrabalho(i):
+    sketches, f = PARTILHADO["sketches"], PARTILHADO["medida"]
+    return i, [f(sketches[i], sketches[j]) for j in range(len(sketches))]
+
+def allVsAll(seqs, k=21, s=1000, medida="jaccard", processos=None):
+    """Calcula os sketches de todas as seqs e a matriz de semelhanças (jaccard, containment ou mash), as duas fases
+    distribuídas por um conjunto de processos. Devolve (sketches, matriz)."""
+    seqs = list(seqs)
+    with Pool(processos) as pool:
+        sketches = pool.map(sketchTrabalho, [(x, k, s) for x in seqs])
+    mat = [None] * len(seqs)
+    with Pool(processos, iniciaLinhas, (sketches, medida)) as pool:
+        for i, linha in pool.imap_unordered(linhaTrabalho, range(len(seqs))):
+            mat[i] = linha
+    return sketches, mat
+
+
+def test():
+    from MySeq import MySeq
+    from random import Random
+    r = Random(1)
+    base = "".join(r.choice("ACGT") for _ in range(5000))
+    mut = "".join(c if r.random() > 0.02 else r.choice("ACGT") for c in base)
+    outra = "".join(r.choice("ACGT") for _ in range(5000))
+    a, b, c = sketch(MySeq(base), 16, 500), sketch(MySeq(mut), 16, 500), sketch(MySeq(outra), 16, 500)
+    print(a, round(jaccard(a, b), 3), round(jaccard(a, c), 3), round(mashDistance(a, b), 4))
+    print(round(containment(sketch(MySeq(base[:2000]), 16, 500), a), 3))
+    print(len(minimizers(MySeq(base), 15, 10)))
+
+if __name__ == "__main__":
+    test()
@@ -161,9 +161,10 @@ def test2():
     #print(st.repeats(2,2))
     #print(st.nodes_below(2))
 
-test()
-print()
-test2()
+if __name__ == "__main__":
+    test()
+    print()
+    test2()
         
             
     
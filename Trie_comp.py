@@ -75,6 +75,7 @@ def test2():
     print (t.prefix_trie_match("GAGATCCTA"))
     print (t.trie_matches("GAGATCCTA"))
     
-test()
-print()
-test2()
+if __name__ == "__main__":
+    test()
+    print()
+    test2()
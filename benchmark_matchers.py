@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from Automata_comp import Automata
+from BoyerMoore_comp import BoyerMoore
+from Trie_comp import Trie
+from BWT_comp import BWT
+
+
+def loadSuffixTree():
+    """O ficheiro da árvore de sufixos tem um espaço no nome, por isso não pode ser importado com import"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SuffixTree_comp_e_ EX1.py")
+    spec = importlib.util.spec_from_file_location("SuffixTree_comp_e_EX1", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod.SuffixTree
+
+SuffixTree = loadSuffixTree()
+
+
+# GERAÇÃO DOS DADOS
+
+def randomGenome(size, alphabet="ACGT", rng=None):
+    rng = rng or random.Random()
+    return "".join(rng.choice(alphabet) for _ in range(size))
+
+def randomReads(genome, nreads, readlen, alphabet="ACGT", randomFrac=0.1, rng=None):
+    """Gera reads de tamanho readlen: a maioria retirada do genoma (tem pelo menos um hit) e uma fração randomFrac
+    totalmente aleatória (normalmente sem hits)"""
+    rng = rng or random.Random()
+    reads = []
+    for _ in range(nreads):
+        if rng.random() < randomFrac:
+            reads.append("".join(rng.choice(alphabet) for _ in range(readlen)))
+        else:
+            pos = rng.randint(0, len(genome) - readlen)
+            reads.append(genome[pos:pos+readlen])
+    return reads
+
+def naiveSearch(genome, reads):
+    """Referência para validar os hits: str.find sobre todas as posições (inclui ocorrências sobrepostas)"""
+    res = {}
+    for p in set(reads):
+        hits = []
+        pos = genome.find(p)
+        while pos != -1:
+            hits.append(pos)
+            pos = genome.find(p, pos + 1)
+        res[p] = hits
+    return res
+
+
+# MOTORES
+# cada motor tem uma função build (recebe o genoma e os reads e devolve o que foi pré-processado) e uma função query
+# (recebe o que foi pré-processado e devolve um {} padrão -> lista ordenada de posições)
+
+def buildAutomata(genome, reads, alphabet):
+    return [(p, Automata(alphabet, p)) for p in set(reads)] #um autómato por padrão
+
+def queryAutomata(built, genome):
+    return {p: auto.occurencesPattern(genome) for p, auto in built}
+
+def buildBoyerMoore(genome, reads, alphabet):
+    return [(p, BoyerMoore(alphabet, p)) for p in set(reads)]
+
+def queryBoyerMoore(built, genome):
+    return {p: bm.search_pattern(genome) for p, bm in built}
+
+def buildTrie(genome, reads, alphabet):
+    t = Trie() #uma única trie com todos os padrões
+    t.trie_from_patterns(set(reads))
+    return (t, set(reads))
+
+def queryTrie(built, genome):
+    t, pats = built
+    res = {p: [] for p in pats}
+    for pos, m in t.trie_matches(genome):
+        res[m].append(pos)
+    return res
+
+def buildBWT(genome, reads, alphabet):
+    return BWT(genome + "$", True)
+
+def queryBWT(built, genome, reads):
+    return {p: built.bw_matching_pos(p) for p in set(reads)}
+
+def buildSuffixTree(genome, reads, alphabet):
+    st = SuffixTree()
+    st.suffix_tree_from_seq(genome)
+    return st
+
+def querySuffixTree(built, genome, reads):
+    res = {}
+    for p in set(reads):
+        m = built.find_pattern(p)
+        res[p] = sorted(m) if m is not None else []
+    return res
+
+# os motores baseados em índices do genoma precisam dos reads na query, os restantes já os têm no build
+ENGINES = {
+    "automata": (buildAutomata, lambda b, g, r: queryAutomata(b, g)),
+    "boyermoore": (buildBoyerMoore, lambda b, g, r: queryBoyerMoore(b, g)),
+    "trie": (buildTrie, lambda b, g, r: queryTrie(b, g)),
+    "bwt": (buildBWT, queryBWT),
+    "suffixtree": (buildSuffixTree, querySuffixTree),
+}
+
+
+# BENCHMARK
+
+MEMORY_SAMPLE = 10
+
+def runEngine(name, genome, reads, alphabet, measureMemory=True):
+    build, query = ENGINES[name]
+    t0 = time.perf_counter()
+    built = build(genome, reads, alphabet)
+    t1 = time.perf_counter()
+    hits = query(built, genome, reads)
+    t2 = time.perf_counter()
+    res = {
+        "build_time": t1 - t0,
+        "query_time": t2 - t1,
+        "queries_per_sec": len(reads) / (t2 - t1) if t2 > t1 else None,
+        "bases_per_sec": len(reads) * len(reads[0]) / (t2 - t1) if reads and t2 > t1 else None,
+    }
+    if measureMemory: #segunda execução com o tracemalloc ligado, para não contaminar os tempos
+        del built
+        tracemalloc.start()
+        built = build(genome, reads, alphabet)
+        res["build_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        query(built, genome, reads[:MEMORY_SAMPLE]) #o pico por query não depende do nº de reads, basta uma amostra
+        res["query_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return res, hits
+
+def compareHits(hits, reference):
+    """Devolve a lista dos padrões em que o motor discorda da referência"""
+    return sorted(p for p in reference if sorted(hits.get(p, [])) != reference[p])
+
+def runBenchmark(genomeSize=1000, nreads=100, readlen=12, alphabet="ACGT", randomFrac=0.1, seed=0,
+                 engines=None, repeats=1, measureMemory=True):
+    """Corre todos os motores sobre o mesmo genoma e os mesmos reads e devolve um {} pronto a converter em JSON"""
+    rng = random.Random(seed)
+    genome = randomGenome(genomeSize, alphabet, rng)
+    reads = randomReads(genome, nreads, readlen, alphabet, randomFrac, rng)
+    reference = naiveSearch(genome, reads)
+    result = {
+        "params": {"genome_size": genomeSize, "nreads": nreads, "readlen": readlen, "alphabet": alphabet,
+                   "random_frac": randomFrac, "seed": seed, "repeats": repeats},
+        "total_hits": sum(len(h) for h in reference.values()),
+        "engines": {},
+    }
+    for name in engines or ENGINES:
+        runs = []
+        try:
+            for r in range(repeats):
+                stats, hits = runEngine(name, genome, reads, alphabet, measureMemory and r == 0)
+                runs.append(stats)
+        except Exception as e: #um motor que falhe (ex.: recursão da árvore de sufixos em genomas grandes) não estraga os outros
+            tracemalloc.stop()
+            result["engines"][name] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        stats = runs[0]
+        stats["build_time"] = min(x["build_time"] for x in runs) #melhor de N repetições
+        stats["query_time"] = min(x["query_time"] for x in runs)
+        stats["queries_per_sec"] = max(x["queries_per_sec"] or 0 for x in runs) or None
+        stats["bases_per_sec"] = max(x["bases_per_sec"] or 0 for x in runs) or None
+        mismatches = compareHits(hits, reference)
+        stats["agrees"] = not mismatches
+        stats["mismatched_patterns"] = mismatches[:10]
+        result["engines"][name] = stats
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos algoritmos de pesquisa exata de padrões")
+    parser.add_argument("--genome-size", type=int, default=1000)
+    parser.add_argument("--nreads", type=int, default=100)
+    parser.add_argument("--readlen", type=int, default=12)
+    parser.add_argument("--alphabet", default="ACGT")
+    parser.add_argument("--random-frac", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=None)
+    parser.add_argument("--no-memory", action="store_true", help="não medir o pico de memória")
+    parser.add_argument("--output", default=None, help="ficheiro JSON de saída (por defeito stdout)")
+    args = parser.parse_args(argv)
+    res = runBenchmark(args.genome_size, args.nreads, args.readlen, args.alphabet, args.random_frac,
+                       args.seed, args.engines, args.repeats, not args.no_memory)
+    out = json.dumps(res, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+if __name__ == "__main__":
+    main()
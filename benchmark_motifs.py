@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import tempfile
+import time
+
+from MySeq import MySeq
+from MotifFinding_comp_e_EX import MotifFinding
+from EAMotifs import EAMotifsInt
+
+
+# GERAÇÃO DOS DADOS
+
+def plantedMotifs(nseqs, seqLen, motifLen, mutationRate=0.1, lenVar=0, alphabet="ACGT", rng=None):
+    """Gera nseqs seqs aleatórias de comprimento seqLen (+- lenVar) e planta em cada uma, numa posição aleatória, uma
+    cópia do mesmo motif com cada base mutada com probabilidade mutationRate. Devolve (seqs, motif, posições)."""
+    rng = rng or random.Random()
+    motif = "".join(rng.choice(alphabet) for _ in range(motifLen))
+    seqs, positions = [], []
+    for _ in range(nseqs):
+        n = max(motifLen, seqLen + rng.randint(-lenVar, lenVar))
+        s = "".join(rng.choice(alphabet) for _ in range(n))
+        copy = "".join(rng.choice(alphabet) if rng.random() < mutationRate else c for c in motif)
+        pos = rng.randint(0, n - motifLen)
+        seqs.append(MySeq(s[:pos] + copy + s[pos + motifLen:]))
+        positions.append(pos)
+    return seqs, motif, positions
+
+def recovery(mf, sol, motif, positions):
+    """Medidas de recuperação do motif plantado: fração de seqs com a posição exata, fração das bases plantadas
+    cobertas pelas janelas encontradas, consenso e a sua distância ao motif, e o score contra o das posições certas"""
+    L = len(motif)
+    exact = sum(1 for p, q in zip(sol, positions) if p == q)
+    overlap = sum(max(0, L - abs(p - q)) for p, q in zip(sol, positions) if p is not None)
+    consensus = mf.createMotifFromIndexes(sol).consensus() if None not in sol else None
+    return {
+        "exact": exact / len(positions),
+        "overlap": overlap / (L * len(positions)),
+        "consensus": consensus,
+        "consensus_distance": sum(a != b for a, b in zip(consensus, motif)) if consensus else None,
+        "score": mf.score(sol),
+        "planted_score": mf.score(positions),
+    }
+
+
+# ESTRATÉGIAS
+# cada estratégia recebe o MotifFinding, a semente e o nº de processos e devolve as posições iniciais encontradas
+
+def runEA(mf, seed, procs, popsize=60, numits=200, noffspring=30):
+    with tempfile.TemporaryDirectory() as d: #o EAMotifsInt lê as seqs de um ficheiro
+        path = os.path.join(d, "seqs.txt")
+        with open(path, "w") as f:
+            for s in mf.seqs:
+                f.write(s.seq + "\n")
+        ea = EAMotifsInt(popsize, numits, noffspring, path)
+    ea.motifs.motifSize = mf.motifSize
+    with contextlib.redirect_stdout(io.StringIO()): #o run imprime todas as iterações
+        ea.run()
+    mf.avaliacoes += ea.motifs.avaliacoes #os scores dos genomas que não estavam na cache de fitness
+    return list(ea.bestsol.getGenes())
+
+def seeded(f):
+    def run(mf, seed, procs):
+        random.seed(seed)
+        return f(mf, seed, procs)
+    return run
+
+STRATEGIES = {
+    "exhaustive": lambda mf, seed, procs: mf.exhaustiveSearch(),
+    "parallelExhaustive": lambda mf, seed, procs: mf.parallelExhaustiveSearch(procs),
+    "branchAndBound": lambda mf, seed, procs: mf.branchAndBound(procs),
+    "heuristicConsensus": lambda mf, seed, procs: mf.heuristicConsensus(),
+    "heuristicStochastic": seeded(lambda mf, seed, procs: mf.heuristicStochastic()),
+    "parallelHeuristicStochastic": lambda mf, seed, procs: mf.parallelHeuristicStochastic(64, procs, seed),
+    "gibbs": seeded(lambda mf, seed, procs: mf.gibbs(1000)),
+    "gibbsEX": seeded(lambda mf, seed, procs: mf.gibbsEX(1000)),
+    "parallelGibbs": lambda mf, seed, procs: mf.parallelGibbs(8, 1000, procs, seed, temperatura=4.0, reinicios=2),
+    "em": lambda mf, seed, procs: mf.em("oops", 8, processos=procs, semente=seed),
+    "medianString": lambda mf, seed, procs: mf.medianStringSearch(),
+    "eaInt": seeded(runEA),
+}
+EXACT = ("exhaustive", "parallelExhaustive", "branchAndBound") #têm de chegar todas ao mesmo score
+
+
+# BENCHMARK
+
+def strategyWorker(name, seqs, motifLen, seed, procs, out):
+    """Corre uma estratégia num processo à parte, numa sessão nova: no fim do tempo mata-se o grupo de processos todo,
+    incluindo os pools das estratégias paralelas. As avaliações são as que o MotifFinding conta (MotifFinding.avaliacoes:
+    soluções pontuadas ou janelas candidatas postas contra um perfil, já somadas as dos processos do pool)."""
+    os.setsid()
+    try:
+        mf = MotifFinding(motifLen, seqs)
+        t0 = time.perf_counter()
+        sol = STRATEGIES[name](mf, seed, procs)
+        t1 = time.perf_counter()
+        out.put({"status": "ok", "time": t1 - t0, "solution": sol, "evaluations": mf.avaliacoes})
+    except Exception as e:
+        out.put({"status": "error", "error": f"{type(e).__name__}: {e}"})
+
+def runStrategy(name, seqs, motifLen, seed, procs, budget):
+    out = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=strategyWorker, args=(name, seqs, motifLen, seed, procs, out))
+    t0 = time.perf_counter()
+    proc.start()
+    try:
+        res = out.get(timeout=budget)
+    except queue.Empty:
+        res = {"status": "timeout", "time": time.perf_counter() - t0}
+        try:
+            os.killpg(proc.pid, signal.SIGKILL) #o processo é o líder do seu grupo (setsid)
+        except ProcessLookupError: #ainda não tinha chegado ao setsid
+            proc.terminate()
+    proc.join()
+    return res
+
+def runBenchmark(nseqs=4, seqLen=24, motifLen=6, mutationRate=0.1, lenVar=0, seed=0, strategies=None, budget=10.0,
+                 procs=1):
+    """Corre as estratégias sobre o mesmo conjunto com um motif plantado e devolve um {} pronto a converter em JSON"""
+    rng = random.Random(seed)
+    seqs, motif, positions = plantedMotifs(nseqs, seqLen, motifLen, mutationRate, lenVar, rng=rng)
+    mf = MotifFinding(motifLen, seqs)
+    result = {
+        "params": {"nseqs": nseqs, "seq_len": seqLen, "motif_len": motifLen, "mutation_rate": mutationRate,
+                   "len_var": lenVar, "seed": seed, "budget": budget, "procs": procs},
+        "motif": motif,
+        "positions": positions,
+        "strategies": {},
+    }
+    for name in strategies or STRATEGIES:
+        stats = runStrategy(name, seqs, motifLen, seed, procs, budget)
+        if stats["status"] == "ok":
+            stats.update(recovery(mf, stats["solution"], motif, positions))
+            stats["evals_per_sec"] = stats["evaluations"] / stats["time"] if stats["evaluations"] and stats["time"] > 0 \
+                else None
+        result["strategies"][name] = stats
+    exatas = [result["strategies"][n] for n in EXACT if n in result["strategies"]]
+    result["exact_checked"] = len(exatas) >= 2 #só há verificação se correram pelo menos 2 estratégias exatas
+    if not result["exact_checked"] or any(x["status"] != "ok" for x in exatas):
+        result["exact_agree"] = None #nada para comparar, ou alguma exata acabou por tempo ou com erro
+    else:
+        result["exact_agree"] = len({x["score"] for x in exatas}) == 1
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das estratégias de procura de motifs com motifs plantados")
+    parser.add_argument("--nseqs", type=int, default=4)
+    parser.add_argument("--seq-len", type=int, default=24)
+    parser.add_argument("--motif-len", type=int, default=6)
+    parser.add_argument("--mutation-rate", type=float, default=0.1)
+    parser.add_argument("--len-var", type=int, default=0, help="variação máxima do comprimento das seqs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=10.0, help="segundos por estratégia")
+    parser.add_argument("--procs", type=int, default=1, help="processos das estratégias paralelas")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES), default=None)
+    parser.add_argument("--output", default=None, help="ficheiro JSON de saída (por defeito stdout)")
+    args = parser.parse_args(argv)
+    res = runBenchmark(args.nseqs, args.seq_len, args.motif_len, args.mutation_rate, args.len_var, args.seed,
+                       args.strategies, args.budget, args.procs)
+    out = json.dumps(res, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+    if not res["exact_checked"]: return 0 #não foram pedidas estratégias exatas suficientes para comparar
+    if res["exact_agree"] is None: return 2 #uma estratégia exata pedida acabou por tempo ou com erro
+    return 0 if res["exact_agree"] else 1 #os métodos exatos discordarem é uma regressão
+
+if __name__ == "__main__":
+    raise SystemExit(main())